@@ -0,0 +1,57 @@
+# Generate levels in bulk across a pool of worker processes.
+#
+#   python batchgen.py COUNT [--start SEED] [--processes N] [--out DIR]
+#
+# generates the levels for seeds START .. START+COUNT-1 and stores them in
+# a levels.LevelCache directory, ready to be loaded by GameSession. Each
+# worker returns the level serialized with Level.to_bytes, so only a few
+# hundred bytes per level travel back to the parent. Levels only depend on
+# their seed, so the output is the same whatever the number of processes.
+
+import multiprocessing
+import sys
+import time
+
+import escape
+from levels import LevelCache
+
+def generate(seed):
+    # Worker: build one level and hand back its serialized form
+    return seed, escape.make_map(seed).to_bytes()
+
+def generate_levels(seeds, processes=None, chunksize=64):
+    # Yield (seed, data) for every seed, in the order of seeds. Seeds are
+    # sent to the workers in chunks to keep the per-level overhead low.
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(generate, seeds, chunksize):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Generate Escape levels in bulk')
+    parser.add_argument('count', type=int, help='number of levels to generate')
+    parser.add_argument('--start', type=int, default=0, help='first seed')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--out', default='levels', help='level cache directory')
+    args = parser.parse_args(argv[1:])
+
+    cache = LevelCache(args.out)
+    start = time.time()
+    size = 0
+    for seed, data in generate_levels(range(args.start, args.start + args.count), args.processes):
+        cache.store_data(escape.GENERATOR_VERSION, seed, escape.MAP_WIDTH, escape.MAP_HEIGHT, data)
+        size += len(data)
+    elapsed = time.time() - start
+    print('%d levels in %.2f s (%.0f levels/s), %.1f KiB' % (
+        args.count, elapsed, args.count / elapsed, size / 1024.0))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
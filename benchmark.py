@@ -0,0 +1,495 @@
+# Benchmarks for Escape.
+#
+# Everything runs headless: the game is driven through GameSession and the
+# root console is opened with SDL's dummy video driver, so no display is
+# needed.
+#
+#   python benchmark.py                      run and compare to the baseline
+#   python benchmark.py --output out.json    also write the results as JSON
+#   python benchmark.py --save-baseline      store the results as the baseline
+#   python benchmark.py --tiles [scale]      compare TileMap with the old Tile layout
+#
+# Import times are measured in a fresh interpreter, so they include loading
+# libtcod and everything the module imports at startup.
+#
+# A benchmark counts as a regression when it is more than --tolerance
+# (default 25%) slower than the baseline; the exit status is then 1.
+
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from tilemap import TileMap
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.25
+
+
+#################################################
+# Tile storage
+#################################################
+class LegacyTile:
+    # The old per-cell map tile, kept only to compare against TileMap
+    def __init__(self, blocked, block_sight=None):
+        self.explored = False
+        self.blocked = blocked
+        if block_sight is None: block_sight = blocked
+        self.block_sight = block_sight
+
+
+def legacy_make(width, height, rooms):
+    map = [[ LegacyTile(True) for y in range(height) ] for x in range(width) ]
+    for (x1, y1, x2, y2) in rooms:
+        for x in range(x1, x2 + 1):
+            for y in range(y1, y2 + 1):
+                map[x][y].blocked = False
+                map[x][y].block_sight = False
+    return map
+
+
+def legacy_lookup(map, cells):
+    n = 0
+    for (x, y) in cells:
+        if map[x][y].blocked:
+            n += 1
+    return n
+
+
+def tilemap_make(width, height, rooms):
+    map = TileMap(width, height)
+    for (x1, y1, x2, y2) in rooms:
+        map.carve_rect(x1, y1, x2, y2)
+    return map
+
+
+def tilemap_lookup(map, cells):
+    n = 0
+    for (x, y) in cells:
+        if map.is_blocked(x, y):
+            n += 1
+    return n
+
+
+def measure_memory(func, *args):
+    # Bytes allocated by func while the result is still alive
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_tiles(scale=1, repeat=5):
+    rng = random.Random(0)
+    side = int(scale ** 0.5) or 1
+    width, height = 80 * side, 43 * side
+    rooms = []
+    for i in range(30 * scale):
+        w = rng.randint(6, 10)
+        h = rng.randint(6, 10)
+        x = rng.randint(0, width - w - 1)
+        y = rng.randint(0, height - h - 1)
+        rooms.append((x, y, x + w - 1, y + h - 1))
+    cells = [(rng.randint(0, width - 1), rng.randint(0, height - 1)) for i in range(10000)]
+
+    legacy = legacy_make(width, height, rooms)
+    tiles = tilemap_make(width, height, rooms)
+    assert legacy_lookup(legacy, cells) == tilemap_lookup(tiles, cells)
+
+    results = {}
+    for name, make, lookup, map in (('legacy', legacy_make, legacy_lookup, legacy),
+                                    ('tilemap', tilemap_make, tilemap_lookup, tiles)):
+        results[name] = {
+            'make': min(timeit.repeat(lambda: make(width, height, rooms), number=1, repeat=repeat)),
+            'lookup': min(timeit.repeat(lambda: lookup(map, cells), number=1, repeat=repeat)),
+            'memory': measure_memory(make, width, height, rooms),
+        }
+    return (width, height), results
+
+
+def print_tiles(scale):
+    (width, height), results = bench_tiles(scale)
+    print('Tile storage, %dx%d map' % (width, height))
+    for name in ('legacy', 'tilemap'):
+        r = results[name]
+        memory = '%d KiB' % (r['memory'] // 1024) if r['memory'] is not None else 'n/a'
+        print('  %-8s make %8.2f ms   10k lookups %7.2f ms   memory %s' % (
+            name, r['make'] * 1000, r['lookup'] * 1000, memory))
+
+
+#################################################
+# Game benchmarks
+#################################################
+def init_console():
+    # Open the root console without a display; libtcod needs it (and the
+    # font) before anything can be drawn on an offscreen console
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import libtcodpy as libtcod
+    import escape
+    libtcod.console_set_custom_font(b'arial10x10.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+    libtcod.console_init_root(escape.SCREEN_WIDTH, escape.SCREEN_HEIGHT, b'Escape benchmarks', False)
+
+
+# Every benchmark plays the same level so runs are comparable
+BENCHMARK_SEED = 1234
+
+def immortal_session():
+    # A fresh session whose player cannot die, so turns keep running
+    import escape
+    session = escape.GameSession(seed=BENCHMARK_SEED)
+    session.player.fighter.max_hp = session.player.fighter.hp = 10 ** 9
+    return session
+
+
+def add_monsters(session, count, rng):
+    # Drop count extra orcs on random free floor cells
+    import escape
+    import libtcodpy as libtcod
+    free = [(x, y) for y in range(escape.MAP_HEIGHT) for x in range(escape.MAP_WIDTH)
+            if not session.is_blocked(x, y)]
+    rng.shuffle(free)
+    for (x, y) in free[:count]:
+        fighter_component = escape.Fighter(hp=10, defense=0, power=3, death_function=escape.monster_death)
+        monster = escape.Object(x, y, 'o', libtcod.desaturated_green, 'Orc', blocks=True,
+                                fighter=fighter_component, ai=escape.BasicMonster())
+        session.add_object(monster)
+
+
+def bench_make_map():
+    import escape
+    seeds = itertools.count()
+    return lambda: escape.make_map(next(seeds))
+
+
+def bench_render_fov():
+    session = immortal_session()
+    session.enable_rendering()
+    def run():
+        session.fov_recompute = True
+        session.render_all()
+    return run
+
+
+def bench_render_idle():
+    session = immortal_session()
+    session.enable_rendering()
+    session.render_all()
+    def run():
+        session.render_all()
+    return run
+
+
+def bench_large_world():
+    # Walk back and forth and redraw in a 4000x4000 world: only the chunks
+    # around the player are ever generated
+    import escape
+    session = escape.GameSession(seed=BENCHMARK_SEED, world_width=4000, world_height=4000)
+    session.player.fighter.max_hp = session.player.fighter.hp = 10 ** 9
+    session.enable_rendering()
+    moves = itertools.count()
+    def run():
+        session.step(('move', 1 if next(moves) % 2 else -1, 0))
+        session.render_all()
+    return run
+
+
+def bench_ai(count):
+    def setup():
+        session = immortal_session()
+        add_monsters(session, count, random.Random(count))
+        return lambda: session.step(('wait',))
+    return setup
+
+
+def room_candidates(count):
+    # count random rooms on a map big enough to accept most of them
+    import escape
+    rng = random.Random(count)
+    side = int(count ** 0.5) * (escape.ROOM_MAX_SIZE + 4)
+    rooms = []
+    for i in range(count):
+        w = rng.randint(escape.ROOM_MIN_SIZE, escape.ROOM_MAX_SIZE)
+        h = rng.randint(escape.ROOM_MIN_SIZE, escape.ROOM_MAX_SIZE)
+        rooms.append(escape.Rect(rng.randint(0, side - w - 1), rng.randint(0, side - h - 1), w, h))
+    return rooms
+
+
+def bench_room_placement_list(count):
+    # Placement the way make_map used to do it: test every accepted room
+    def setup():
+        candidates = room_candidates(count)
+        def run():
+            rooms = []
+            for new_room in candidates:
+                for other_room in rooms:
+                    if new_room.intersect(other_room):
+                        break
+                else:
+                    rooms.append(new_room)
+        return run
+    return setup
+
+
+def bench_room_placement_index(count):
+    def setup():
+        import escape
+        candidates = room_candidates(count)
+        def run():
+            index = escape.RoomIndex()
+            for new_room in candidates:
+                if not index.intersects(new_room):
+                    index.add(new_room)
+        return run
+    return setup
+
+
+def bench_messages():
+    session = immortal_session()
+    text = 'The orc attacks the player for 3 hit points, and the player strikes back with a rusty sword!'
+    def run():
+        for i in range(100):
+            session.message(text)
+    return run
+
+
+def bench_menu():
+    import escape
+    options = ['Healing Potion %d' % i for i in range(26)]
+    return lambda: escape.render_menu('Press the key next to an item to use it, or any other key to cancel.\n',
+                                      options, escape.INVENTORY_WIDTH)
+
+
+def bench_console_buffer(name):
+    # Blit a full screen ConsoleBuffer, after changing one cell so the
+    # buffer is never clean
+    def setup():
+        import escape
+        import libtcodpy as libtcod
+        con = libtcod.console_new(escape.SCREEN_WIDTH, escape.SCREEN_HEIGHT)
+        buf = getattr(libtcod, name)(escape.SCREEN_WIDTH, escape.SCREEN_HEIGHT, 0, 0, 80, 255, 255, 255, '.')
+        def run():
+            buf.set(0, 0, 0, 0, 0, 255, 255, 255, '@')
+            buf.blit(con)
+        return run
+    return setup
+
+
+def bench_color_lerp():
+    # Per-cell lighting of a full screen, one color at a time
+    import escape
+    import libtcodpy as libtcod
+    n = escape.SCREEN_WIDTH * escape.SCREEN_HEIGHT
+    coefs = [float(i) / n for i in range(n)]
+    return lambda: [libtcod.color_lerp(libtcod.black, libtcod.light_yellow, a) for a in coefs]
+
+
+def bench_color_lerp_array():
+    # The same lighting as one batch
+    import escape
+    import libtcodpy as libtcod
+    n = escape.SCREEN_WIDTH * escape.SCREEN_HEIGHT
+    coefs = [float(i) / n for i in range(n)]
+    return lambda: libtcod.color_lerp_array(libtcod.black, libtcod.light_yellow, coefs)
+
+
+def bench_calls(name):
+    # 1000 calls of one libtcodpy wrapper, to follow the cost of a single
+    # trip through ctypes
+    def setup():
+        import libtcodpy as libtcod
+        con = libtcod.console_new(80, 50)
+        fov_map = libtcod.map_new(80, 50)
+        rng = libtcod.random_new_from_seed(BENCHMARK_SEED)
+        color = libtcod.Color(200, 180, 50)
+        calls = {
+            'console_put_char': lambda: libtcod.console_put_char(con, 3, 4, '@', libtcod.BKGND_NONE),
+            'console_set_char_background': lambda: libtcod.console_set_char_background(con, 3, 4, color),
+            'console_set_default_foreground': lambda: libtcod.console_set_default_foreground(con, color),
+            'map_is_in_fov': lambda: libtcod.map_is_in_fov(fov_map, 3, 4),
+            'random_get_float': lambda: libtcod.random_get_float(rng, 0.0, 1.0),
+        }
+        call = calls[name]
+        def run():
+            for i in range(1000):
+                call()
+        return run
+    return setup
+
+
+def bench_draw(batched):
+    # Draw 1000 entities of different colors on an offscreen console, one
+    # libtcod call per attribute or as one batch
+    def setup():
+        import libtcodpy as libtcod
+        con = libtcod.console_new(80, 50)
+        rng = random.Random(BENCHMARK_SEED)
+        colors = [libtcod.desaturated_green, libtcod.darker_green, libtcod.white, libtcod.violet]
+        records = [(rng.randrange(80), rng.randrange(50), rng.choice('ogT@'), rng.choice(colors), None)
+                   for i in range(1000)]
+        if batched:
+            return lambda: libtcod.console_draw_batch(con, records)
+        def run():
+            for (x, y, char, color, back) in records:
+                libtcod.console_set_default_foreground(con, color)
+                libtcod.console_put_char(con, x, y, char, libtcod.BKGND_NONE)
+        return run
+    return setup
+
+
+def bench_noise(grid):
+    # Sample a map sized fbm noise, one point per call or as one grid
+    def setup():
+        import escape
+        import libtcodpy as libtcod
+        noise = libtcod.noise_new(2, random=libtcod.random_new_from_seed(BENCHMARK_SEED))
+        (w, h) = (escape.MAP_WIDTH, escape.MAP_HEIGHT)
+        if grid:
+            return lambda: libtcod.noise_get_fbm_grid(noise, w, h, 4.0, 0.1, 0.1)
+        return lambda: [libtcod.noise_get_fbm(noise, [x * 0.1, y * 0.1], 4.0) for y in range(h) for x in range(w)]
+    return setup
+
+
+# name -> (setup returning the function to time, number of calls per timing)
+BENCHMARKS = [
+    ('make_map', bench_make_map, 20),
+    ('render_all_fov', bench_render_fov, 50),
+    ('render_all_no_fov', bench_render_idle, 50),
+    ('world_4000_step_render', bench_large_world, 50),
+    ('ai_turn_10', bench_ai(10), 50),
+    ('ai_turn_100', bench_ai(100), 50),
+    ('ai_turn_1000', bench_ai(1000), 10),
+    ('room_placement_list_3000', bench_room_placement_list(3000), 1),
+    ('room_placement_index_3000', bench_room_placement_index(3000), 1),
+    ('message_x100', bench_messages, 20),
+    ('menu_render', bench_menu, 50),
+    ('console_buffer_blit', bench_console_buffer('ConsoleBuffer'), 20),
+    ('array_console_buffer_blit', bench_console_buffer('ArrayConsoleBuffer'), 20),
+    ('color_lerp_screen', bench_color_lerp, 5),
+    ('color_lerp_array_screen', bench_color_lerp_array, 5),
+    ('call_console_put_char_x1000', bench_calls('console_put_char'), 10),
+    ('call_console_set_char_background_x1000', bench_calls('console_set_char_background'), 10),
+    ('call_console_set_default_foreground_x1000', bench_calls('console_set_default_foreground'), 10),
+    ('call_map_is_in_fov_x1000', bench_calls('map_is_in_fov'), 10),
+    ('call_random_get_float_x1000', bench_calls('random_get_float'), 10),
+    ('draw_calls_x1000', bench_draw(False), 10),
+    ('draw_batch_x1000', bench_draw(True), 10),
+    ('noise_fbm_points_map', bench_noise(False), 10),
+    ('noise_fbm_grid_map', bench_noise(True), 10),
+]
+
+
+# Modules whose startup import is timed, as import_<module>
+IMPORT_BENCHMARKS = ['libtcodpy', 'escape']
+
+
+def measure_import(module, repeat=5):
+    # Seconds taken by `import module` in a new interpreter, best of repeat.
+    # The first run is not counted: it may have to write the bytecode
+    # cache, which a normal launch finds already there.
+    code = 'import time; start = time.time(); import %s; print(time.time() - start)' % module
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    times = []
+    for i in range(repeat + 1):
+        times.append(float(subprocess.check_output([sys.executable, '-c', code], env=env)))
+    return min(times[1:])
+
+
+def benchmark_names():
+    return [name for name, setup, number in BENCHMARKS] + ['import_' + m for m in IMPORT_BENCHMARKS]
+
+
+def run_benchmarks(repeat=5):
+    # Seconds per call of each benchmark, best of repeat
+    results = {}
+    for module in IMPORT_BENCHMARKS:
+        results['import_' + module] = measure_import(module, repeat)
+    init_console()
+    for name, setup, number in BENCHMARKS:
+        run = setup()
+        results[name] = min(timeit.repeat(run, number=number, repeat=repeat)) / number
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # List of (name, current, baseline, ratio) for every benchmark slower
+    # than the baseline by more than tolerance
+    regressions = []
+    for name in sorted(results):
+        if name in baseline:
+            ratio = results[name] / baseline[name]
+            if ratio > 1 + tolerance:
+                regressions.append((name, results[name], baseline[name], ratio))
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['benchmarks']
+
+
+def write_results(path, results):
+    with open(path, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'benchmarks': results}, f, indent=2, sort_keys=True)
+
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Escape benchmarks')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown before a benchmark counts as a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--tiles', type=int, nargs='?', const=1, metavar='SCALE',
+                        help='only compare TileMap with the old Tile layout')
+    args = parser.parse_args(argv[1:])
+
+    if args.tiles:
+        print_tiles(args.tiles)
+        return 0
+
+    results = run_benchmarks(args.repeat)
+    baseline = load_baseline(args.baseline)
+    for name in benchmark_names():
+        line = '%-20s %10.3f ms' % (name, results[name] * 1000)
+        if baseline and name in baseline:
+            line += '   baseline %10.3f ms  (%+.0f%%)' % (baseline[name] * 1000, (results[name] / baseline[name] - 1) * 100)
+        print(line)
+
+    if args.output:
+        write_results(args.output, results)
+    if args.save_baseline:
+        write_results(args.baseline, results)
+        print('Baseline saved to ' + args.baseline)
+        return 0
+
+    if baseline is None:
+        print('No baseline at %s, run with --save-baseline to create one' % args.baseline)
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for (name, current, base, ratio) in regressions:
+        print('REGRESSION %s: %.3f ms vs %.3f ms baseline (x%.2f)' % (name, current * 1000, base * 1000, ratio))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,156 @@
+#
+# libtcod 1.5.1 python wrapper: C prototypes
+#
+# Argument and return types of the libtcod functions libtcodpy calls in its
+# console, fov, path and random modules. With them ctypes converts the
+# arguments in C: the wrappers can pass plain Python numbers instead of
+# building a c_int or c_float for each, pointers keep all their bits on 64
+# bits systems, and a wrong argument (a string for a coordinate, a tuple
+# for a color, a missing parameter) raises ctypes.ArgumentError or
+# TypeError before libtcod is called instead of being passed on as garbage.
+#
+# libtcodpy calls setup_protos once at import, on every platform.
+
+from ctypes import *
+
+def setup_protos(lib):
+    from libtcodpy import Color, c_bool
+
+    # opaque libtcod types
+    console = c_void_p
+    fov_map = c_void_p
+    path = c_void_p
+    dijkstra = c_void_p
+    rng = c_void_p
+    int_p = POINTER(c_int)
+    path_func = CFUNCTYPE(c_float, c_int, c_int, c_int, c_int, py_object)
+
+    protos = [
+        # console module
+        ('TCOD_console_init_root', None, [c_int, c_int, c_char_p, c_bool, c_int]),
+        ('TCOD_console_set_custom_font', None, [c_char_p, c_int, c_int, c_int]),
+        ('TCOD_console_map_ascii_code_to_font', None, [c_int, c_int, c_int]),
+        ('TCOD_console_map_ascii_codes_to_font', None, [c_int, c_int, c_int, c_int]),
+        ('TCOD_console_map_string_to_font', None, [c_char_p, c_int, c_int]),
+        ('TCOD_console_map_string_to_font_utf', None, [c_wchar_p, c_int, c_int]),
+        ('TCOD_console_is_fullscreen', c_bool, []),
+        ('TCOD_console_set_fullscreen', None, [c_bool]),
+        ('TCOD_console_is_window_closed', c_bool, []),
+        ('TCOD_console_set_window_title', None, [c_char_p]),
+        ('TCOD_console_credits', None, []),
+        ('TCOD_console_credits_reset', None, []),
+        ('TCOD_console_credits_render', c_bool, [c_int, c_int, c_bool]),
+        ('TCOD_console_flush', None, []),
+        ('TCOD_console_set_default_background', None, [console, Color]),
+        ('TCOD_console_set_default_foreground', None, [console, Color]),
+        ('TCOD_console_clear', None, [console]),
+        ('TCOD_console_put_char', None, [console, c_int, c_int, c_int, c_int]),
+        ('TCOD_console_put_char_ex', None, [console, c_int, c_int, c_int, Color, Color]),
+        ('TCOD_console_set_char_background', None, [console, c_int, c_int, Color, c_int]),
+        ('TCOD_console_set_char_foreground', None, [console, c_int, c_int, Color]),
+        ('TCOD_console_set_char', None, [console, c_int, c_int, c_int]),
+        ('TCOD_console_set_background_flag', None, [console, c_int]),
+        ('TCOD_console_get_background_flag', c_int, [console]),
+        ('TCOD_console_set_alignment', None, [console, c_int]),
+        ('TCOD_console_get_alignment', c_int, [console]),
+        # the print functions take printf style varargs: only the fixed
+        # arguments are declared
+        ('TCOD_console_print', None, [console, c_int, c_int, c_char_p]),
+        ('TCOD_console_print_utf', None, [console, c_int, c_int, c_wchar_p]),
+        ('TCOD_console_print_ex', None, [console, c_int, c_int, c_int, c_int, c_char_p]),
+        ('TCOD_console_print_ex_utf', None, [console, c_int, c_int, c_int, c_int, c_wchar_p]),
+        ('TCOD_console_print_rect', c_int, [console, c_int, c_int, c_int, c_int, c_char_p]),
+        ('TCOD_console_print_rect_utf', c_int, [console, c_int, c_int, c_int, c_int, c_wchar_p]),
+        ('TCOD_console_print_rect_ex', c_int, [console, c_int, c_int, c_int, c_int, c_int, c_int, c_char_p]),
+        ('TCOD_console_print_rect_ex_utf', c_int, [console, c_int, c_int, c_int, c_int, c_int, c_int, c_wchar_p]),
+        ('TCOD_console_get_height_rect', c_int, [console, c_int, c_int, c_int, c_int, c_char_p]),
+        ('TCOD_console_get_height_rect_utf', c_int, [console, c_int, c_int, c_int, c_int, c_wchar_p]),
+        ('TCOD_console_rect', None, [console, c_int, c_int, c_int, c_int, c_bool, c_int]),
+        ('TCOD_console_hline', None, [console, c_int, c_int, c_int, c_int]),
+        ('TCOD_console_vline', None, [console, c_int, c_int, c_int, c_int]),
+        ('TCOD_console_print_frame', None, [console, c_int, c_int, c_int, c_int, c_bool, c_int, c_char_p]),
+        ('TCOD_console_set_color_control', None, [c_int, Color, Color]),
+        ('TCOD_console_get_default_background', Color, [console]),
+        ('TCOD_console_get_default_foreground', Color, [console]),
+        ('TCOD_console_get_char_background', Color, [console, c_int, c_int]),
+        ('TCOD_console_get_char_foreground', Color, [console, c_int, c_int]),
+        ('TCOD_console_get_char', c_int, [console, c_int, c_int]),
+        ('TCOD_console_set_fade', None, [c_uint8, Color]),
+        ('TCOD_console_get_fade', c_uint8, []),
+        ('TCOD_console_get_fading_color', Color, []),
+        ('TCOD_console_wait_for_keypress_wrapper', None, [c_void_p, c_bool]),
+        ('TCOD_console_check_for_keypress_wrapper', None, [c_void_p, c_int]),
+        ('TCOD_console_is_key_pressed', c_bool, [c_int]),
+        ('TCOD_console_set_keyboard_repeat', None, [c_int, c_int]),
+        ('TCOD_console_disable_keyboard_repeat', None, []),
+        ('TCOD_console_new', console, [c_int, c_int]),
+        ('TCOD_console_from_file', console, [c_char_p]),
+        ('TCOD_console_get_width', c_int, [console]),
+        ('TCOD_console_get_height', c_int, [console]),
+        ('TCOD_console_blit', None, [console, c_int, c_int, c_int, c_int, console, c_int, c_int, c_float, c_float]),
+        ('TCOD_console_set_key_color', None, [console, Color]),
+        ('TCOD_console_delete', None, [console]),
+        ('TCOD_console_fill_background', None, [console, int_p, int_p, int_p]),
+        ('TCOD_console_fill_foreground', None, [console, int_p, int_p, int_p]),
+        ('TCOD_console_fill_char', None, [console, int_p]),
+        ('TCOD_console_load_asc', c_bool, [console, c_char_p]),
+        ('TCOD_console_save_asc', c_bool, [console, c_char_p]),
+        ('TCOD_console_load_apf', c_bool, [console, c_char_p]),
+        ('TCOD_console_save_apf', c_bool, [console, c_char_p]),
+
+        # random module
+        ('TCOD_random_get_instance', rng, []),
+        ('TCOD_random_new', rng, [c_int]),
+        ('TCOD_random_new_from_seed', rng, [c_int, c_uint]),
+        ('TCOD_random_set_distribution', None, [rng, c_int]),
+        ('TCOD_random_get_int', c_int, [rng, c_int, c_int]),
+        ('TCOD_random_get_float', c_float, [rng, c_float, c_float]),
+        ('TCOD_random_get_double', c_double, [rng, c_double, c_double]),
+        ('TCOD_random_get_int_mean', c_int, [rng, c_int, c_int, c_int]),
+        ('TCOD_random_get_float_mean', c_float, [rng, c_float, c_float, c_float]),
+        ('TCOD_random_get_double_mean', c_double, [rng, c_double, c_double, c_double]),
+        ('TCOD_random_save', rng, [rng]),
+        ('TCOD_random_restore', None, [rng, rng]),
+        ('TCOD_random_delete', None, [rng]),
+
+        # fov module
+        ('TCOD_map_new', fov_map, [c_int, c_int]),
+        ('TCOD_map_copy', None, [fov_map, fov_map]),
+        ('TCOD_map_set_properties', None, [fov_map, c_int, c_int, c_bool, c_bool]),
+        ('TCOD_map_clear', None, [fov_map, c_bool, c_bool]),
+        ('TCOD_map_compute_fov', None, [fov_map, c_int, c_int, c_int, c_bool, c_int]),
+        ('TCOD_map_is_in_fov', c_bool, [fov_map, c_int, c_int]),
+        ('TCOD_map_is_transparent', c_bool, [fov_map, c_int, c_int]),
+        ('TCOD_map_is_walkable', c_bool, [fov_map, c_int, c_int]),
+        ('TCOD_map_delete', None, [fov_map]),
+        ('TCOD_map_get_width', c_int, [fov_map]),
+        ('TCOD_map_get_height', c_int, [fov_map]),
+
+        # pathfinding module
+        ('TCOD_path_new_using_map', path, [fov_map, c_float]),
+        ('TCOD_path_new_using_function', path, [c_int, c_int, path_func, py_object, c_float]),
+        ('TCOD_path_compute', c_bool, [path, c_int, c_int, c_int, c_int]),
+        ('TCOD_path_get_origin', None, [path, int_p, int_p]),
+        ('TCOD_path_get_destination', None, [path, int_p, int_p]),
+        ('TCOD_path_size', c_int, [path]),
+        ('TCOD_path_reverse', None, [path]),
+        ('TCOD_path_get', None, [path, c_int, int_p, int_p]),
+        ('TCOD_path_is_empty', c_bool, [path]),
+        ('TCOD_path_walk', c_bool, [path, int_p, int_p, c_bool]),
+        ('TCOD_path_delete', None, [path]),
+        ('TCOD_dijkstra_new', dijkstra, [fov_map, c_float]),
+        ('TCOD_dijkstra_new_using_function', dijkstra, [c_int, c_int, path_func, py_object, c_float]),
+        ('TCOD_dijkstra_compute', None, [dijkstra, c_int, c_int]),
+        ('TCOD_dijkstra_get_distance', c_float, [dijkstra, c_int, c_int]),
+        ('TCOD_dijkstra_path_set', c_bool, [dijkstra, c_int, c_int]),
+        ('TCOD_dijkstra_size', c_int, [dijkstra]),
+        ('TCOD_dijkstra_reverse', None, [dijkstra]),
+        ('TCOD_dijkstra_get', None, [dijkstra, c_int, int_p, int_p]),
+        ('TCOD_dijkstra_is_empty', c_bool, [dijkstra]),
+        ('TCOD_dijkstra_path_walk', c_bool, [dijkstra, int_p, int_p]),
+        ('TCOD_dijkstra_delete', None, [dijkstra]),
+    ]
+    for name, restype, argtypes in protos:
+        func = getattr(lib, name)
+        func.restype = restype
+        func.argtypes = argtypes
@@ -1,6 +1,16 @@
 import libtcodpy as libtcod
 import math
-import textwrap
+
+from levels import Level
+from messagelog import MessageLog
+from scheduler import NORMAL_SPEED, Scheduler
+from tilemap import ChunkedTileMap, TileMap
+
+try:  #import NumPy if available
+    import numpy
+    numpy_available = True
+except ImportError:
+    numpy_available = False
 
 SCREEN_WIDTH = 80
 SCREEN_HEIGHT = 50
@@ -9,6 +19,17 @@ SCREEN_HEIGHT = 50
 MAP_WIDTH = 80
 MAP_HEIGHT = 43
 
+# Part of the world shown on screen. The camera scrolls to recenter on the
+# player when it gets closer than CAMERA_MARGIN to an edge of the view,
+# which must stay above TORCH_RADIUS so the FOV is never cut short.
+VIEW_WIDTH = 80
+VIEW_HEIGHT = 43
+CAMERA_MARGIN = 12
+
+# Worlds larger than one level are split in chunks generated as the player
+# gets near them
+CHUNK_SIZE = 64
+
 BAR_WIDTH = 20
 PANEL_HEIGHT = 7
 PANEL_Y = SCREEN_HEIGHT - PANEL_HEIGHT
@@ -16,6 +37,19 @@ MSG_X = BAR_WIDTH + 2
 MSG_WIDTH = SCREEN_WIDTH - BAR_WIDTH  - 2
 MSG_HEIGHT = PANEL_HEIGHT - 1
 
+# (x, y, width, height) of the parts of the panel redrawn separately: the
+# names under the mouse, the HP bar and the message log
+PANEL_REGIONS = {
+    'names': (0, 0, SCREEN_WIDTH, 1),
+    'hp': (0, 1, MSG_X, PANEL_HEIGHT - 1),
+    'messages': (MSG_X, 1, SCREEN_WIDTH - MSG_X, MSG_HEIGHT),
+}
+
+# Messages kept for the history viewer, and the size of its window
+HISTORY_SIZE = 1000
+HISTORY_WIDTH = 70
+HISTORY_HEIGHT = 40
+
 # Parameters for dungeon generator
 ROOM_MAX_SIZE = 10
 ROOM_MIN_SIZE = 6
@@ -33,11 +67,35 @@ TORCH_RADIUS = 10
 
 LIMIT_FPS = 20
 
+# Turn based: the main loop sleeps until a key or the mouse does something
+# and only repaints when the game changed. Otherwise it polls LIMIT_FPS
+# times per second and repaints every frame.
+TURN_BASED = True
+
 color_dark_wall = libtcod.Color(0, 0, 100)
 color_dark_ground = libtcod.Color(50, 50, 150)
 color_light_wall = libtcod.Color(130, 110, 50)
 color_light_ground = libtcod.Color(200, 180, 50)
 
+# Map background colors indexed by shade: 0 unexplored, 1-2 dark
+# ground/wall, 3-4 lit ground/wall
+shade_colors = [libtcod.black, color_dark_ground, color_dark_wall, color_light_ground, color_light_wall]
+
+# When more than this fraction of the view changed shade, refill the whole
+# background in one call instead of cell by cell
+SHADE_REFILL_FRACTION = 8
+
+if numpy_available:
+    # The same colors as an array for vectorized shading
+    shade_palette = numpy.array([(0, 0, 0), tuple(color_dark_ground), tuple(color_dark_wall),
+        tuple(color_light_ground), tuple(color_light_wall)], dtype=numpy.uint8)
+
+# The eight cells around a cell, as (dx, dy)
+DIRECTIONS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+# Cost of a diagonal step in the monsters' flow field
+DIAGONAL_COST = 1.41
+
 # Classes for Escape
 class Rect:
     # a rectangle on the map. Used to characterize a room.
@@ -48,22 +106,86 @@ class Rect:
         self.y2 = y + h
 
     def center(self):
-        center_x = (self.x1 + self.x2) / 2
-        center_y = (self.y2 + self.y2) / 2
+        center_x = (self.x1 + self.x2) // 2
+        center_y = (self.y1 + self.y2) // 2
         return (center_x, center_y)
 
     def intersect(self, other):
         # Returns true if this rectangle intersects with another
         return (self.x1 <= other.x2 and self.x2 >= other.x1 and self.y1 <= other.y2 and self.y2 >= other.y1)
 
-class Tile:
-    # A tile of the map and its properties
-    def __init__(self, blocked, block_sight = None):
-        self.explored = False
-        self.blocked = blocked
-        # By default, if the tile is blocked, it also blocks sight
-        if block_sight is None: block_sight = blocked 
-        self.block_sight = block_sight
+class RoomIndex:
+    # Grid of buckets holding the rooms that overlap each bucket, so finding
+    # the rooms a new one could intersect only looks at its neighbourhood
+    # instead of every room placed so far
+    def __init__(self, bucket_size=ROOM_MAX_SIZE + 1):
+        self.bucket_size = bucket_size
+        self.buckets = {}
+
+    def _keys(self, rect):
+        size = self.bucket_size
+        for bx in range(rect.x1 // size, rect.x2 // size + 1):
+            for by in range(rect.y1 // size, rect.y2 // size + 1):
+                yield (bx, by)
+
+    def add(self, rect):
+        for key in self._keys(rect):
+            self.buckets.setdefault(key, []).append(rect)
+
+    def intersects(self, rect):
+        # True if rect intersects any room in the index
+        for key in self._keys(rect):
+            for other in self.buckets.get(key, ()):
+                if rect.intersect(other):
+                    return True
+        return False
+
+class Occupancy:
+    # Index of the objects standing on each map cell, so looking up what is
+    # on a cell does not need a scan of the whole objects list. Objects are
+    # also filed in a coarse grid of buckets, so finding those in a
+    # rectangle (the camera view) only looks at the buckets it overlaps.
+    def __init__(self, bucket_size=16):
+        self.cells = {}
+        self.bucket_size = bucket_size
+        self.buckets = {}
+
+    def add(self, obj):
+        self.cells.setdefault((obj.x, obj.y), []).append(obj)
+        key = (obj.x // self.bucket_size, obj.y // self.bucket_size)
+        self.buckets.setdefault(key, set()).add(obj)
+
+    def remove(self, obj):
+        cell = self.cells.get((obj.x, obj.y))
+        if cell is not None and obj in cell:
+            cell.remove(obj)
+            if not cell:
+                del self.cells[(obj.x, obj.y)]
+            key = (obj.x // self.bucket_size, obj.y // self.bucket_size)
+            bucket = self.buckets[key]
+            bucket.discard(obj)
+            if not bucket:
+                del self.buckets[key]
+
+    def objects_at(self, x, y):
+        # Objects on the cell, in the order they were added
+        return self.cells.get((x, y), ())
+
+    def is_blocked(self, x, y):
+        # True if a blocking object stands on the cell
+        for obj in self.cells.get((x, y), ()):
+            if obj.blocks:
+                return True
+        return False
+
+    def objects_in(self, x1, y1, x2, y2):
+        # Objects inside the rectangle (bounds inclusive), in no particular order
+        size = self.bucket_size
+        for by in range(y1 // size, y2 // size + 1):
+            for bx in range(x1 // size, x2 // size + 1):
+                for obj in self.buckets.get((bx, by), ()):
+                    if x1 <= obj.x <= x2 and y1 <= obj.y <= y2:
+                        yield obj
 
 class Object:
     # This is a generic object: the player, a monster, an item, the stairs...
@@ -75,6 +197,11 @@ class Object:
         self.color = color
         self.name = name
         self.blocks = blocks
+        # The GameSession the object lives in, set by GameSession.add_object
+        self.session = None
+        # Drawing order among objects on the same cell, the highest on top,
+        # set by GameSession.add_object and send_to_back
+        self.depth = 0
         self.fighter = fighter
         if self.fighter: # Let the fighter component know who owns it
             self.fighter.owner = self
@@ -89,10 +216,17 @@ class Object:
 
 
     def move(self, dx, dy):
-        if not is_blocked(self.x + dx, self.y + dy):
+        if not self.session.is_blocked(self.x + dx, self.y + dy):
             # Move by the given amount
-            self.x += dx
-            self.y += dy
+            self.set_position(self.x + dx, self.y + dy)
+
+    def set_position(self, x, y):
+        # Put the object on (x, y) and keep the occupancy index up to date
+        occupancy = self.session.occupancy
+        occupancy.remove(self)
+        self.x = x
+        self.y = y
+        occupancy.add(self)
 
     def move_towards(self, target_x, target_y):
         # Vector from the object to the target and the distance
@@ -112,21 +246,11 @@ class Object:
         dy = other.y - self.y
         return math.sqrt(dx ** 2 + dy ** 2)
 
-    def draw(self):
-        if libtcod.map_is_in_fov(fov_map, self.x, self.y):
-            # Set the color and then draw the character that represents this object at its position.
-            libtcod.console_set_default_foreground(con, self.color)
-            libtcod.console_put_char(con, self.x, self.y, self.char, libtcod.BKGND_NONE)
-
-    def clear(self):
-        # Erase the character that represents this object
-        libtcod.console_put_char(con, self.x, self.y, ' ', libtcod.BKGND_NONE)
-
     def send_to_back(self):
         # Make this object draw first so all other objects appear above it if they are on the same tile
-        global objects
-        objects.remove(self)
-        objects.insert(0, self)
+        session = self.session
+        session.bottom_depth -= 1
+        self.depth = session.bottom_depth
 
 class Fighter:
     # Combat-related properties and methods (monster, player, NPC)
@@ -150,6 +274,7 @@ class Fighter:
     def attack(self, target):
         # Simple formula for attack damage
         damage = self.power - target.fighter.defense
+        message = self.owner.session.message
 
         if damage > 0:
             # Make the target take some damage
@@ -167,13 +292,23 @@ class Fighter:
 
 class BasicMonster:
      # AI for basic monster
+     def __init__(self, speed=NORMAL_SPEED):
+         # How often the monster gets to act, NORMAL_SPEED being as often
+         # as the player
+         self.speed = speed
+
      def take_turn(self):
          # the basic monster takes its turn, if you can see it, it can see you
          monster = self.owner
-         if libtcod.map_is_in_fov(fov_map, monster.x, monster.y):
-            # Move towards the player if far away
+         session = monster.session
+         player = session.player
+         if session.is_in_fov(monster.x, monster.y):
+            # Move towards the player if far away, following the flow field
+            # so walls are walked around rather than into
             if monster.distance_to(player) >= 2:
-                monster.move_towards(player.x, player.y)
+                step = session.step_towards_player(monster.x, monster.y)
+                if step is not None:
+                    monster.move(step[0], step[1])
                 # Close enough attach if the player is alive
             elif player.fighter.hp > 0: 
                 monster.fighter.attack(player)
@@ -185,50 +320,39 @@ class Item:
     # An item that can be picked up and used
     def pick_up(self):
         # Add to the players inventory and remove from the map
-        if len(inventory) >= 26:
-            message('Your inventory is full, cannot pick up ' + self.owner.name + '.', libtcod.red)
+        session = self.owner.session
+        if len(session.inventory) >= 26:
+            session.message('Your inventory is full, cannot pick up ' + self.owner.name + '.', libtcod.red)
         else:
-            inventory.append(self.owner)
-            objects.remove(self.owner)
-            message('You picked up a ' + self.owner.name + '!', libtcod.green)
+            session.inventory.append(self.owner)
+            session.remove_object(self.owner)
+            session.message('You picked up a ' + self.owner.name + '!', libtcod.green)
 
     def use(self):
         # Just call the use_function if it is defined
+        session = self.owner.session
         if self.use_function is None:
-            message('The ' + self.owner.name + ' cannot be used.')
+            session.message('The ' + self.owner.name + ' cannot be used.')
         else:
-            if self.use_function != 'cancelled':
-                inventory.remove(self.owner) # Destroy after use unless it was cancelled for some reason
-                cast_heal()
+            if self.use_function(session) != 'cancelled':
+                session.inventory.remove(self.owner) # Destroy after use unless it was cancelled for some reason
 
 # Escape functions
-def cast_heal():
+def cast_heal(session):
     # Heal the player
+    player = session.player
     if player.fighter.hp == player.fighter.max_hp:
-        message('You are already at full health.', libtcod.red)
+        session.message('You are already at full health.', libtcod.red)
         return 'cancelled'
 
-    message('Your wonds begin to heal!', libtcod.light_violet)
+    session.message('Your wonds begin to heal!', libtcod.light_violet)
     player.fighter.heal(HEAL_AMOUNT)
 
-
-def message(new_msg, color = libtcod.white):
-    # Split messages if neccessary among multiple lines
-    new_msg_lines = textwrap.wrap(new_msg, MSG_WIDTH)
-
-    for line in new_msg_lines:
-        # If the buffer is full, remove the first line to make room for the new one
-        if len(game_msgs) == MSG_HEIGHT:
-            del game_msgs[0]
-
-        # Add new line as tuple, with the text and color
-        game_msgs.append( (line, color) )
-
 def player_death(player):
     # the game ends
-    global game_state
-    message('You died!', libtcod.red)
-    game_state = 'dead'
+    session = player.session
+    session.message('You died!', libtcod.red)
+    session.game_state = 'dead'
 
     # For added effect transform the player into a corpse
     player.char = '%'
@@ -236,7 +360,7 @@ def player_death(player):
 
 def monster_death(monster):
      # transform it into a nasty corpse it dosent block move or attack
-     message(monster.name.capitalize() + ' is dead!', libtcod.orange)
+     monster.session.message(monster.name.capitalize() + ' is dead!', libtcod.orange)
      monster.char = '%'
      monster.color = libtcod.dark_red
      monster.blocks = False
@@ -245,125 +369,97 @@ def monster_death(monster):
      monster.send_to_back()
      monster.name = 'Remains of ' + monster.name
 
-def is_blocked(x, y):
+# Level generation. Bump GENERATOR_VERSION whenever a change makes the same
+# seed produce a different level, so cached levels are not reused.
+GENERATOR_VERSION = 2
 
-    # First test the map tile
-    if map[x][y].blocked:
-        return True
-
-    # Now check for any blocking objects
-    for object in objects:
-        if object.blocks and object.x == x and object.y == y:
-            return True
+def create_room(level, room):
+    # Go throu the tiles in the rectangle and make them passable
+    level.map.carve_rect(room.x1 + 1, room.y1 + 1, room.x2 - 1, room.y2 - 1)
 
-    return False
+def create_h_tunnel(level, x1, x2, y):
+    level.map.carve_h_line(x1, x2, y)
 
-def create_room(room):
-    global map
-    # Go throu the tiles in the rectangle and make them passable
-    for x in range(room.x1 + 1, room.x2):
-        for y in range(room.y1 + 1, room.y2):
-            map[x][y].blocked = False
-            map[x][y].block_sight = False
-
-def create_h_tunnel(x1, x2, y):
-    global map
-    for x in range(min(x1, x2), max(x1, x2) + 1):
-        map[x][y].blocked = False
-        map[x][y].block_sight = False
-
-def create_v_tunnel(y1, y2, x):
-    global map
+def create_v_tunnel(level, y1, y2, x):
     # Vertical tunnel
-    for y in range(min(y1, y2), max(y1, y2) + 1):
-        map[x][y].blocked = False
-        map[x][y].block_sight = False
+    level.map.carve_v_line(y1, y2, x)
+
+def place_objects(level, room, rng, blockers):
+    # blockers holds the cells taken by the player and the monsters placed so far
+    def is_blocked(x, y):
+        return level.map.is_blocked(x, y) or (x, y) in blockers
 
-def place_objects(room):
     # Choose a random number of monsters
-    num_monsters = libtcod.random_get_int(0, 0, MAX_ROOM_MONSTERS)
+    num_monsters = libtcod.random_get_int(rng, 0, MAX_ROOM_MONSTERS)
 
     for i in range(num_monsters):
         # Choose random spot for this monsert
-        x = libtcod.random_get_int(0, room.x1+1, room.x2-1)
-        y = libtcod.random_get_int(0, room.y1+1, room.y2-1)
+        x = libtcod.random_get_int(rng, room.x1+1, room.x2-1)
+        y = libtcod.random_get_int(rng, room.y1+1, room.y2-1)
 
         if not is_blocked(x, y):
-            if libtcod.random_get_int(0, 0, 100) < 80: # 80 percent chance of getting an orc
-                # Create an orc
-                fighter_component = Fighter(hp=10, defense=0, power=3, death_function=monster_death)
-                ai_component = BasicMonster()
-                monster = Object(x, y, 'o', libtcod.desaturated_green, 'Orc', blocks=True, fighter=fighter_component, ai=ai_component)
+            if libtcod.random_get_int(rng, 0, 100) < 80: # 80 percent chance of getting an orc
+                level.spawns.append(('orc', x, y))
             else:
-                # Create a troll
-                fighter_component = Fighter(hp=16, defense=1, power=4, death_function=monster_death)
-                ai_component = BasicMonster()
-                monster = Object(x, y, 'T', libtcod.darker_green, 'Troll', blocks=True, fighter=fighter_component, ai=ai_component)
-
-            objects.append(monster)
+                level.spawns.append(('troll', x, y))
+            blockers.add((x, y))
 
     # Choose random number of room items
-    num_items = libtcod.random_get_int(0, 0, MAX_ROOM_ITEMS)
+    num_items = libtcod.random_get_int(rng, 0, MAX_ROOM_ITEMS)
 
     for i in range(num_items):
         # Choose random spot for this item
-        x = libtcod.random_get_int(0, room.x1+1, room.x2-1)
-        y = libtcod.random_get_int(0, room.y1+1, room.y2-1)
+        x = libtcod.random_get_int(rng, room.x1+1, room.x2-1)
+        y = libtcod.random_get_int(rng, room.y1+1, room.y2-1)
 
         # Only place it if the tile is not blocked
         if not is_blocked(x, y):
-            # Create a healing potion
-            item_component = Item(use_function=cast_heal)
-            item = Object(x, y, '!', libtcod.violet, 'Healing Potion', item=item_component)
-
-            objects.append(item)
-            item.send_to_back() #items appear below other objects
+            level.spawns.append(('healing_potion', x, y))
 
+def make_map(seed, width=MAP_WIDTH, height=MAP_HEIGHT, max_rooms=MAX_ROOMS):
+    # Generate the level for seed. Rooms and spawns each draw from their own
+    # random stream, so changing how monsters are placed does not move rooms.
+    level = Level(seed, GENERATOR_VERSION, width, height)
+    master_rng = libtcod.random_new_from_seed(seed)
+    room_rng = libtcod.random_new_from_seed(libtcod.random_get_int(master_rng, 0, 0x7fffffff))
+    spawn_rng = libtcod.random_new_from_seed(libtcod.random_get_int(master_rng, 0, 0x7fffffff))
 
-def make_map():
-    global map, player
-    
-    # Fill map with "blocked" tiles
-    map = [[ Tile(True)
-        for y in range(MAP_HEIGHT) ]
-            for x in range(MAP_WIDTH) ]
     rooms = []
+    room_index = RoomIndex()
     num_rooms = 0
+    blockers = set()
 
-    for r in range(MAX_ROOMS):
+    for r in range(max_rooms):
         # Random width and height
-        w = libtcod.random_get_int(0, ROOM_MIN_SIZE, ROOM_MAX_SIZE)
-        h = libtcod.random_get_int(0, ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+        w = libtcod.random_get_int(room_rng, ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+        h = libtcod.random_get_int(room_rng, ROOM_MIN_SIZE, ROOM_MAX_SIZE)
         # Random position without going out of the boundaries of the map
-        x = libtcod.random_get_int(0, 0, MAP_WIDTH - w -1)
-        y = libtcod.random_get_int(0, 0, MAP_HEIGHT - h - 1)
+        x = libtcod.random_get_int(room_rng, 0, width - w -1)
+        y = libtcod.random_get_int(room_rng, 0, height - h - 1)
 
         # Rect class makes rectangles easier to work with
         new_room = Rect(x, y, w, h)
 
-        # Run through the other rooms and see if they intersect with this one
-        failed = False
-        for other_room in rooms:
-            if new_room.intersect(other_room):
-                failed = True;
-                break
+        # See if any of the other rooms intersect with this one
+        failed = room_index.intersects(new_room)
 
         if not failed:
             # This means there are no intersections so this room is valid
 
             # Paint it to the maps tile
-            create_room(new_room)
+            create_room(level, new_room)
 
             # Add monsters
-            place_objects(new_room)
+            place_objects(level, new_room, spawn_rng, blockers)
 
             # Center coordinates of new room, will be usefull later
             (new_x, new_y) = new_room.center()
 
             if num_rooms == 0:
                 # this is the first room, where the player starts
-                player.x = new_x
-                player.y = new_y
+                level.player_x = new_x
+                level.player_y = new_y
+                blockers.add((new_x, new_y))
             else:
                 # All rooms after the first
                 # Connect it to the previous room with a tunnel
@@ -372,175 +468,735 @@ def make_map():
                 (prev_x, prev_y) = rooms[num_rooms - 1].center()
 
                 # Draw a coin (random number that is either 0 or 1)
-                if libtcod.random_get_int(0, 0, 1) == 1:
+                if libtcod.random_get_int(room_rng, 0, 1) == 1:
                     # First move horizontally then vertially
-                    create_h_tunnel(prev_x, new_x, prev_y)
-                    create_v_tunnel(prev_y, new_y, prev_x)
+                    create_h_tunnel(level, prev_x, new_x, prev_y)
+                    create_v_tunnel(level, prev_y, new_y, prev_x)
                 else:
-                    create_v_tunnel(prev_y, new_y, prev_x)
-                    create_h_tunnel(prev_x, new_x, prev_y)
+                    create_v_tunnel(level, prev_y, new_y, prev_x)
+                    create_h_tunnel(level, prev_x, new_x, prev_y)
 
             # Finally append the new room to the list
             rooms.append(new_room)
+            room_index.add(new_room)
+            level.rooms.append((new_room.x1, new_room.y1, new_room.x2, new_room.y2))
             num_rooms += 1
 
-def render_all():
-    global color_light_wall, color_light_ground
-    global color_dark_ground, color_dark_wall
-    global fov_map, fov_recompute
-
-    if fov_recompute:
-        # Recompute of the FOV is needed
-        fov_recompute = False
-        libtcod.map_compute_fov(fov_map, player.x, player.y, TORCH_RADIUS, FOV_LIGHT_WALLS, FOV_ALGO)
-
-        # Go through all tiles, and set their background color
-        for y in range(MAP_HEIGHT):
-            for x in range(MAP_WIDTH):
-                visible = libtcod.map_is_in_fov(fov_map, x, y)
-                wall = map[x][y].block_sight
-                if not visible:
-                    # If it's not visible right now. The player can only see it if it is eplored
-                    if map[x][y].explored:
-                        if wall:
-                            libtcod.console_set_char_background(con, x, y, color_dark_wall, libtcod.BKGND_SET)
-                        else:
-                            libtcod.console_set_char_background(con, x, y, color_dark_ground, libtcod.BKGND_SET)
-                else:
-                    if wall:
-                        libtcod.console_set_char_background(con, x, y, color_light_wall, libtcod.BKGND_SET)
-                    else:
-                        libtcod.console_set_char_background(con, x, y, color_light_ground, libtcod.BKGND_SET)
-                        # Since it is visible explore it
-                        map[x][y].explored = True
-    # Draw all objects in the list
-    for object in objects:
-        if object != player:
-            object.draw()
-    player.draw()
-
-    # Blit the contents to the root console
-    libtcod.console_blit(con, 0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, 0, 0, 0)
-    
-    # Prepare to render the GUI panel
-    libtcod.console_set_default_background(panel, libtcod.black)
-    libtcod.console_clear(panel)
-    
-    # print game messages one line at a time
-    y = 1
-    for (line, color) in game_msgs:
-        libtcod.console_set_default_foreground(panel, color)
-        libtcod.console_print_ex(panel, MSG_X, y, libtcod.BKGND_NONE, libtcod.LEFT, line)
-        y += 1
-    
-    # Show the players stats
-    render_bar(1, 1, BAR_WIDTH, 'HP', player.fighter.hp, player.fighter.max_hp, libtcod.light_red, libtcod.darker_red)
-
-    # Display names of objects under the mouse
-    libtcod.console_set_default_foreground(panel, libtcod.light_gray)
-    libtcod.console_print_ex(panel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT, get_names_under_mouse())
-
-    # Blit the contents of panel to the root console
-    libtcod.console_blit(panel, 0, 0, SCREEN_WIDTH, PANEL_HEIGHT, 0, 0, PANEL_Y)
-
-def player_move_or_attack(dx, dy):
-    global fov_recompute
+    libtcod.random_delete(spawn_rng)
+    libtcod.random_delete(room_rng)
+    libtcod.random_delete(master_rng)
+    return level
+
+def _mix(*values):
+    # Deterministic hash of a few integers, the same in every process
+    h = 2166136261
+    for v in values:
+        h = ((h ^ (v & 0xffffffff)) * 16777619) & 0xffffffff
+    return h & 0x7fffffff
+
+def _gate(h, size):
+    # Position of a gate along a chunk edge of size cells, away from the
+    # corners unless the edge is too short for that
+    if size < 3:
+        return size // 2
+    return 1 + h % (size - 2)
+
+def make_chunk(seed, cx, cy, width, height, world_width, world_height):
+    # Generate the chunk (cx, cy) of a large world: a small level of its own,
+    # joined to its neighbours through a gate on each shared edge. Both
+    # chunks along an edge compute the same gate, so their tunnels meet.
+    chunk_seed = _mix(seed, cx, cy)
+    if width >= ROOM_MAX_SIZE + 2 and height >= ROOM_MAX_SIZE + 2:
+        max_rooms = max(1, MAX_ROOMS * width * height // (MAP_WIDTH * MAP_HEIGHT))
+        level = make_map(chunk_seed, width, height, max_rooms)
+        (x1, y1, x2, y2) = level.rooms[0]
+        hub = Rect(x1, y1, x2 - x1, y2 - y1).center()
+    else:
+        # Too small for rooms (a cut short edge chunk): just pass through it
+        level = Level(chunk_seed, GENERATOR_VERSION, width, height)
+        hub = (width // 2, height // 2)
+    (hub_x, hub_y) = hub
+
+    # Gate position along each edge, if there is a chunk on the other side
+    chunks_x = (world_width + CHUNK_SIZE - 1) // CHUNK_SIZE
+    chunks_y = (world_height + CHUNK_SIZE - 1) // CHUNK_SIZE
+    if cx > 0:
+        gate = _gate(_mix(seed, 1, cx, cy), height)
+        create_v_tunnel(level, hub_y, gate, hub_x)
+        create_h_tunnel(level, 0, hub_x, gate)
+    if cx + 1 < chunks_x:
+        gate = _gate(_mix(seed, 1, cx + 1, cy), height)
+        create_v_tunnel(level, hub_y, gate, hub_x)
+        create_h_tunnel(level, hub_x, width - 1, gate)
+    if cy > 0:
+        gate = _gate(_mix(seed, 2, cx, cy), width)
+        create_h_tunnel(level, hub_x, gate, hub_y)
+        create_v_tunnel(level, 0, hub_y, gate)
+    if cy + 1 < chunks_y:
+        gate = _gate(_mix(seed, 2, cx, cy + 1), width)
+        create_h_tunnel(level, hub_x, gate, hub_y)
+        create_v_tunnel(level, hub_y, height - 1, gate)
+    level.player_x = hub_x
+    level.player_y = hub_y
+    return level
+
+def spawn_object(kind, x, y):
+    # Create the object for a (kind, x, y) spawn of a Level
+    if kind == 'orc':
+        fighter_component = Fighter(hp=10, defense=0, power=3, death_function=monster_death)
+        ai_component = BasicMonster()
+        return Object(x, y, 'o', libtcod.desaturated_green, 'Orc', blocks=True, fighter=fighter_component, ai=ai_component)
+    elif kind == 'troll':
+        fighter_component = Fighter(hp=16, defense=1, power=4, death_function=monster_death)
+        ai_component = BasicMonster()
+        return Object(x, y, 'T', libtcod.darker_green, 'Troll', blocks=True, fighter=fighter_component, ai=ai_component)
+    elif kind == 'healing_potion':
+        item_component = Item(use_function=cast_heal)
+        return Object(x, y, '!', libtcod.violet, 'Healing Potion', item=item_component)
+    raise ValueError('Unknown spawn kind: ' + repr(kind))
+
+class GameSession:
+    # All the state of one game: the map, objects, messages and FOV.
+    # A session needs no window or font: drive it with step() and only call
+    # enable_rendering() when it should be drawn. Rendering needs the root
+    # console to be initialized (SDL_VIDEODRIVER=dummy works without a
+    # display).
+    def __init__(self, seed=None, cache=None, world_width=MAP_WIDTH, world_height=MAP_HEIGHT):
+        # seed picks the level (a random one if None); cache is an optional
+        # levels.LevelCache to load it from instead of generating it. Worlds
+        # larger than MAP_WIDTH x MAP_HEIGHT are generated chunk by chunk.
+        self.game_state = 'playing'
+        self.con = None
+        self.panel = None
+
+        # Create a list of game messages and thier colors, starts empty
+        self.game_msgs = MessageLog(MSG_WIDTH, MSG_HEIGHT, HISTORY_SIZE)
+        self.inventory = []
+
+        # The Player.
+        fighter_component = Fighter(hp=30, defense=2, power=5, death_function=player_death)
+        self.player = Object(0, 0, '@', libtcod.white, 'player', blocks=True, fighter=fighter_component)
+        self.player.session = self
+        # Game objects, in no particular order: rendering goes by depth
+        self.objects = set([self.player])
+
+        self.fov_map = None
+        self.fov_recompute = True
+        # Distance of every view cell to the player, shared by all the
+        # monsters and rebuilt with the FOV when the player or the map moves
+        self.flow = None
+        self.flow_stale = True
+        # Set when the FOV changed and the map background must be redrawn
+        self.redraw_map = False
+        # What is on con right now, so render_all only redraws what changed:
+        # the shade of every map cell, the (char, color) drawn on each
+        # screen cell holding an object, and the bounding box of the cells
+        # changed since the last blit
+        self.invalidate()
+
+        # Generate map
+        if seed is None:
+            seed = libtcod.random_get_int(0, 0, 0x7fffffff)
+        self.new_level(seed, cache, world_width, world_height)
+
+        self.message('Welcome stranger! Prepare to perish in the Tombs of the Ancient Kings.', libtcod.red)
+
+    def enable_rendering(self):
+        # Create the offscreen consoles used by render_all
+        self.con = libtcod.console_new(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.panel = libtcod.console_new(SCREEN_WIDTH, PANEL_HEIGHT)
+        self.invalidate()
+
+    def invalidate(self):
+        # Forget what is on screen, so the next render_all draws everything.
+        # con is wiped too: the map background is refilled, but the glyphs
+        # of the objects in drawn would stay where they were.
+        if self.con is not None:
+            libtcod.console_set_default_background(self.con, libtcod.black)
+            libtcod.console_clear(self.con)
+        self.needs_redraw = True
+        self.shade = None
+        self.drawn = {}
+        self.objects_changed = True
+        self.redraw_map = True
+        self.dirty_rect = (0, 0, SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
+        self.forget_panel()
+
+    def forget_panel(self):
+        # What each panel region shows (see render_panel), None until drawn
+        self.hud = dict((name, None) for name in PANEL_REGIONS)
+        self.hover = None
+
+    def mark_dirty(self, x1, y1, x2, y2):
+        # Grow the region of con to blit on the next frame
+        self.needs_redraw = True
+        if y2 >= PANEL_Y:
+            # Whatever was drawn over the panel has to go too
+            self.forget_panel()
+        if self.dirty_rect is None:
+            self.dirty_rect = (x1, y1, x2, y2)
+        else:
+            (a1, b1, a2, b2) = self.dirty_rect
+            self.dirty_rect = (min(a1, x1), min(b1, y1), max(a2, x2), max(b2, y2))
+
+    def add_object(self, obj):
+        # Put a new object on the level
+        obj.session = self
+        self.objects.add(obj)
+        self.top_depth += 1
+        obj.depth = self.top_depth
+        self.occupancy.add(obj)
+        if obj.ai:
+            # It acts this turn, or goes to sleep if it is out of sight
+            self.scheduler.schedule(obj)
+        self.objects_changed = True
+
+    def remove_object(self, obj):
+        self.objects.discard(obj)
+        self.occupancy.remove(obj)
+        self.scheduler.remove(obj)
+        self.objects_changed = True
+
+    def message(self, new_msg, color = libtcod.white):
+        self.needs_redraw = True
+        # The log splits messages among multiple lines and drops the oldest
+        # lines from the panel
+        self.game_msgs.add(new_msg, color)
+
+    def is_blocked(self, x, y):
+
+        # First test the map tile
+        if self.map.is_blocked(x, y):
+            return True
 
-    # The coordinates the player is moving to/attacking
-    x = player.x + dx
-    y = player.y + dy
+        # Now check for any blocking objects
+        return self.occupancy.is_blocked(x, y)
+
+    def new_level(self, seed, cache=None, world_width=MAP_WIDTH, world_height=MAP_HEIGHT):
+        # Replace the current level with the one for seed. A world of the
+        # default size is a single chunk made by make_map; bigger worlds
+        # are made of CHUNK_SIZE chunks, generated when first needed.
+        self.seed = seed
+        self.cache = cache
+        if (world_width, world_height) == (MAP_WIDTH, MAP_HEIGHT):
+            (chunk_width, chunk_height) = (world_width, world_height)
+        else:
+            (chunk_width, chunk_height) = (CHUNK_SIZE, CHUNK_SIZE)
+        self.map = ChunkedTileMap(world_width, world_height, chunk_width, chunk_height, self.generate_chunk)
+        self.rooms = []
+
+        # Start a fresh occupancy index holding the player, and a scheduler
+        # for the monsters to come
+        self.objects = set([self.player])
+        # Lowest and highest object depth so far
+        self.bottom_depth = self.top_depth = 0
+        self.occupancy = Occupancy()
+        self.occupancy.add(self.player)
+        self.scheduler = Scheduler()
+
+        # The first chunk holds the start position
+        self.map.chunk(0, 0)
+        self.player.set_position(self.start_x, self.start_y)
+
+        # The part of the world on screen, and the FOV map covering it
+        self.view_width = min(VIEW_WIDTH, world_width)
+        self.view_height = min(VIEW_HEIGHT, world_height)
+        if self.fov_map is not None:
+            libtcod.dijkstra_delete(self.flow)
+            libtcod.map_delete(self.fov_map)
+        self.fov_map = libtcod.map_new(self.view_width, self.view_height)
+        self.flow = libtcod.dijkstra_new(self.fov_map, DIAGONAL_COST)
+        self.flow_distances = libtcod.dijkstra_get_distances(self.flow)
+        self.flow_stale = True
+        self.camera_x = self.camera_y = None
+        self.move_camera()
+
+    def load_chunk_level(self, cx, cy, width, height):
+        # The Level for one chunk, from the cache when the world is a single
+        # classic level
+        if (width, height) == (self.map.width, self.map.height):
+            level = None
+            if self.cache is not None:
+                level = self.cache.load(GENERATOR_VERSION, self.seed, width, height)
+            if level is None:
+                level = make_map(self.seed, width, height)
+                if self.cache is not None:
+                    self.cache.store(level)
+            return level
+        return make_chunk(self.seed, cx, cy, width, height, self.map.width, self.map.height)
+
+    def generate_chunk(self, cx, cy, width, height):
+        # Called by the ChunkedTileMap the first time a chunk is needed:
+        # spawn its objects and hand back its tiles. The Level is copied,
+        # so a cached one can be loaded again.
+        level = self.load_chunk_level(cx, cy, width, height)
+        x0 = cx * self.map.chunk_width
+        y0 = cy * self.map.chunk_height
+        if (cx, cy) == (0, 0):
+            self.start_x = level.player_x
+            self.start_y = level.player_y
+
+        for (x1, y1, x2, y2) in level.rooms:
+            self.rooms.append(Rect(x0 + x1, y0 + y1, x2 - x1, y2 - y1))
+
+        for (kind, x, y) in level.spawns:
+            obj = spawn_object(kind, x0 + x, y0 + y)
+            self.add_object(obj)
+            if obj.item:
+                obj.send_to_back() #items appear below other objects
+
+        if (level.map.width, level.map.height) != (width, height):
+            raise ValueError('Level of %dx%d cells for a %dx%d chunk' % (level.map.width, level.map.height, width, height))
+        tiles = TileMap(width, height)
+        tiles.blocked[:] = level.map.blocked
+        tiles.block_sight[:] = level.map.block_sight
+        return tiles
+
+    def is_in_view(self, x, y):
+        # True if the world cell (x, y) is inside the camera view
+        return (0 <= x - self.camera_x < self.view_width and
+                0 <= y - self.camera_y < self.view_height)
+
+    def is_in_fov(self, x, y):
+        # FOV test in world coordinates; nothing outside the view is visible.
+        # Called for every monster every turn, so is_in_view is inlined.
+        x -= self.camera_x
+        y -= self.camera_y
+        return (0 <= x < self.view_width and 0 <= y < self.view_height and
+                self.fov[y * self.view_width + x] != 0)
+
+    def move_camera(self):
+        # Scroll the view to recenter on the player once it comes within
+        # CAMERA_MARGIN of an edge. Returns True if the camera moved.
+        player = self.player
+        if self.camera_x is not None:
+            px = player.x - self.camera_x
+            py = player.y - self.camera_y
+            if (CAMERA_MARGIN <= px < self.view_width - CAMERA_MARGIN and
+                CAMERA_MARGIN <= py < self.view_height - CAMERA_MARGIN):
+                return False
+
+        camera_x = max(0, min(player.x - self.view_width // 2, self.map.width - self.view_width))
+        camera_y = max(0, min(player.y - self.view_height // 2, self.map.height - self.view_height))
+        if (camera_x, camera_y) == (self.camera_x, self.camera_y):
+            return False
+
+        # Keep what was explored, then generate what is about to come into
+        # view and copy the new window out of the world
+        if self.camera_x is not None:
+            self.map.write_explored(self.view, self.camera_x, self.camera_y)
+        self.map.ensure_region(camera_x - CAMERA_MARGIN, camera_y - CAMERA_MARGIN,
+                               self.view_width + 2 * CAMERA_MARGIN, self.view_height + 2 * CAMERA_MARGIN)
+        self.camera_x = camera_x
+        self.camera_y = camera_y
+        self.view = self.map.read_window(camera_x, camera_y, self.view_width, self.view_height)
+        self.load_fov_map()
+        self.fov_recompute = True
+        # Everything on screen scrolled
+        self.invalidate()
+        return True
 
-    # Try to find the attackable object
-    target = None
-    for object in objects:
-        if object.fighter and object.x == x and object.y == y:
-            target = object
-            break
+    def load_fov_map(self):
+        # Copy the whole view into the FOV map in one pass. Nothing is in
+        # view until the FOV is computed again.
+        libtcod.map_load_properties(self.fov_map, self.view.transparent(), self.view.walkable())
+        self.fov = bytearray(self.view_width * self.view_height)
+
+    def sync_fov_map(self):
+        # Push the tiles changed since the last sync (digging, doors, destroyed
+        # walls...) to the view and the FOV map
+        dirty = self.map.pop_dirty()
+        if not dirty:
+            return
+
+        for (x, y) in dirty:
+            if self.is_in_view(x, y):
+                (vx, vy) = (x - self.camera_x, y - self.camera_y)
+                blocked = self.map.is_blocked(x, y)
+                block_sight = self.map.is_block_sight(x, y)
+                self.view.set_tile(vx, vy, blocked, block_sight)
+                libtcod.map_set_properties(self.fov_map, vx, vy, not block_sight, not blocked)
+        self.fov_recompute = True
+
+    def update_fov(self):
+        # Follow the player with the camera, bring the FOV map up to date
+        # with any tiles that changed and recompute the FOV if needed
+        self.move_camera()
+        self.sync_fov_map()
+        if self.fov_recompute:
+            self.fov_recompute = False
+            libtcod.map_compute_fov(self.fov_map, self.player.x - self.camera_x, self.player.y - self.camera_y,
+                                    TORCH_RADIUS, FOV_LIGHT_WALLS, FOV_ALGO)
+            # What is in view, one byte per view cell, read by everything
+            # that needs the FOV until the next recompute
+            self.fov = libtcod.map_get_fov_snapshot(self.fov_map)
+            self.redraw_map = True
+            # Objects may have come into or gone out of view, and with them
+            # the names under the mouse
+            self.objects_changed = True
+            self.needs_redraw = True
+            # Whatever moved the FOV moved the paths to the player too
+            self.flow_stale = True
+            # Monsters that can see the player now wake up
+            self.scheduler.wake_near(self.player.x, self.player.y, TORCH_RADIUS, self.sees_player)
+
+    def sees_player(self, monster):
+        # If you can see it, it can see you
+        return self.is_in_fov(monster.x, monster.y)
+
+    def step_towards_player(self, x, y):
+        # The (dx, dy) of the neighbour of (x, y) closest to the player along
+        # the flow field, skipping cells taken by blocking objects, or None.
+        # The field is computed once per turn, at the first monster asking.
+        if self.flow_stale:
+            self.flow_stale = False
+            libtcod.dijkstra_compute(self.flow, self.player.x - self.camera_x, self.player.y - self.camera_y)
+        distances = self.flow_distances
+        width = self.view_width
+        lx = x - self.camera_x
+        ly = y - self.camera_y
+        best = distances[ly * width + lx]
+        step = None
+        for (dx, dy) in DIRECTIONS:
+            nx = lx + dx
+            ny = ly + dy
+            if 0 <= nx < width and 0 <= ny < self.view_height:
+                distance = distances[ny * width + nx]
+                if distance < best and not self.occupancy.is_blocked(x + dx, y + dy):
+                    best = distance
+                    step = (dx, dy)
+        return step
+
+    def player_move_or_attack(self, dx, dy):
+        # The coordinates the player is moving to/attacking
+        x = self.player.x + dx
+        y = self.player.y + dy
+
+        # Try to find the attackable object
+        target = None
+        for object in self.occupancy.objects_at(x, y):
+            if object.fighter:
+                target = object
+                break
 
-    # Attack if object found, move if not
-    if target is not None:
-        player.fighter.attack(target) 
-    else:
-        player.move(dx, dy)
-        fov_recompute = True
+        # Attack if object found, move if not
+        if target is not None:
+            self.player.fighter.attack(target) 
+        else:
+            self.player.move(dx, dy)
+            self.fov_recompute = True
+
+    def step(self, action):
+        # Play one player action and, if it took a turn, let the monsters act.
+        # Actions are tuples:
+        #   ('move', dx, dy)  move, or attack whatever is in the way
+        #   ('wait',)         do nothing for a turn
+        #   ('pickup',)       pick up an item on the player's tile
+        #   ('use', index)    use the inventory item at index
+        # Returns 'didnt-take-turn' if the monsters did not get to act.
+        if self.game_state != 'playing':
+            return 'didnt-take-turn'
 
-def get_names_under_mouse():
-    global mouse;
-    (x,y) = (mouse.cx, mouse.cy)
-    # Create a list of all objects all the mouses position and in the player FOV
-    names = [obj.name for obj in objects
-            if obj.x == x and obj.y == y and libtcod.map_is_in_fov(fov_map, obj.x, obj.y)]
-    names = ', '.join(names) # join names seperated by comma
-    return names.capitalize()
+        # Anything may move, die or change hands from here on
+        self.objects_changed = True
+        self.needs_redraw = True
+        kind = action[0]
+        if kind == 'move':
+            self.player_move_or_attack(action[1], action[2])
+        elif kind == 'wait':
+            pass
+        elif kind == 'pickup':
+            # Pick up an item
+            for object in self.occupancy.objects_at(self.player.x, self.player.y): # Look for an item in the players tile
+                if object.item:
+                    object.item.pick_up()
+                    break
+            return 'didnt-take-turn'
+        elif kind == 'use':
+            index = action[1]
+            if 0 <= index < len(self.inventory):
+                self.inventory[index].item.use()
+            return 'didnt-take-turn'
+        else:
+            raise ValueError('Unknown action: ' + repr(kind))
+
+        # Monsters see the player from where they stand now
+        self.update_fov()
+        self.run_monsters()
+
+    def run_monsters(self):
+        # Let every monster due before the player's next turn act. Those out
+        # of sight have nothing to do: they go to sleep until the FOV
+        # reaches them, so they cost nothing turn after turn.
+        scheduler = self.scheduler
+        for (due, monster) in scheduler.advance(scheduler.delay(NORMAL_SPEED)):
+            if monster.ai is None:
+                # Died since it was scheduled
+                continue
+            if not self.sees_player(monster):
+                scheduler.sleep(monster)
+                continue
+            monster.ai.take_turn()
+            if monster.ai is not None:
+                # Counted from when it was due, so a fast monster acts
+                # again within the same turn
+                scheduler.schedule_at(monster, due + scheduler.delay(monster.ai.speed))
+
+    def shade_map(self):
+        # Palette index of every view cell (see shade_colors) as a NumPy
+        # array, marking what is in view as explored
+        view = self.view
+        visible = view.view(self.fov)
+        wall = view.view(view.block_sight) != 0
+        explored = view.view(view.explored)
+
+        # Everything in view is now explored
+        explored |= visible
+
+        return ((1 + wall + 2 * visible) * explored).astype(numpy.uint8)
+
+    def shade_map_slow(self):
+        # Same as shade_map without NumPy, as a flat bytearray built from
+        # the FOV snapshot and the view planes
+        view = self.view
+        # Everything in view is now explored
+        explored = bytearray(e | v for (e, v) in zip(view.explored, self.fov))
+        view.explored[:] = explored
+        return bytearray((1 + w + 2 * v) * e for (w, v, e) in zip(view.block_sight, self.fov, explored))
+
+    def fill_map_background(self, shade):
+        # Push the whole background at once; the rows under the panel stay black
+        view = self.view
+        if numpy_available:
+            background = numpy.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 3), dtype=numpy.uint8)
+            background[:view.height, :view.width] = shade_palette[shade.reshape(view.height, view.width)]
+            libtcod.console_fill_background(self.con, background)
+        else:
+            libtcod.console_set_default_background(self.con, libtcod.black)
+            libtcod.console_clear(self.con)
+            for i in range(len(shade)):
+                if shade[i]:
+                    (y, x) = divmod(i, view.width)
+                    libtcod.console_set_char_background(self.con, x, y, shade_colors[shade[i]], libtcod.BKGND_SET)
+            # Clearing erased the objects too
+            self.drawn = {}
+            self.objects_changed = True
+        self.mark_dirty(0, 0, view.width - 1, view.height - 1)
+
+    def render_map(self):
+        # Shade the map background, only touching the cells whose shade
+        # changed since the last frame
+        view = self.view
+        if numpy_available:
+            shade = self.shade_map().ravel()
+        else:
+            shade = self.shade_map_slow()
+        old = self.shade
+        self.shade = shade
 
-def handle_keys():
-    global fov_recompute, keys
+        if old is None:
+            self.fill_map_background(shade)
+            return
 
+        if numpy_available:
+            changed = numpy.flatnonzero(shade != old).tolist()
+        else:
+            changed = [i for i in range(len(shade)) if shade[i] != old[i]]
+        if not changed:
+            return
+        if len(changed) > len(shade) // SHADE_REFILL_FRACTION:
+            self.fill_map_background(shade)
+            return
+
+        con = self.con
+        (x1, y1, x2, y2) = (view.width, view.height, -1, -1)
+        for i in changed:
+            (y, x) = divmod(i, view.width)
+            libtcod.console_set_char_background(con, x, y, shade_colors[shade[i]], libtcod.BKGND_SET)
+            x1 = min(x1, x)
+            x2 = max(x2, x)
+        # changed is in row order
+        (y1, y2) = (changed[0] // view.width, changed[-1] // view.width)
+        self.mark_dirty(x1, y1, x2, y2)
+
+    def render_objects(self):
+        # Draw the objects in view, redrawing only the cells whose object
+        # appeared, moved, changed or went away since the last frame
+        (camera_x, camera_y) = (self.camera_x, self.camera_y)
+        player = self.player
+        # Only the objects under the camera are looked at, however big the
+        # world is
+        visible = [object for object in self.occupancy.objects_in(camera_x, camera_y,
+                                                                  camera_x + self.view_width - 1,
+                                                                  camera_y + self.view_height - 1)
+                   if object is not player and self.is_in_fov(object.x, object.y)]
+        # Deeper objects first, so what is on top is drawn last
+        visible.sort(key=lambda object: object.depth)
+        drawn = {}
+        for object in visible:
+            drawn[(object.x - camera_x, object.y - camera_y)] = (object.char, object.color)
+        # The player goes last so it is on top of everything
+        if self.is_in_fov(player.x, player.y):
+            drawn[(player.x - camera_x, player.y - camera_y)] = (player.char, player.color)
+
+        old = self.drawn
+        records = []
+        for (x, y) in old:
+            if (x, y) not in drawn:
+                # Erase the character of what left the cell
+                records.append((x, y, ' ', None, None))
+                self.mark_dirty(x, y, x, y)
+        for (x, y), (char, color) in drawn.items():
+            if old.get((x, y)) != (char, color):
+                # Draw the character that represents this object at its position, in its color
+                records.append((x, y, char, color, None))
+                self.mark_dirty(x, y, x, y)
+        # All the changed cells go to the console in one batch
+        libtcod.console_draw_batch(self.con, records)
+        self.drawn = drawn
+
+    def render_all(self, mouse=None):
+        con = self.con
+        self.update_fov()
+
+        if self.redraw_map:
+            # The FOV changed, so the map background may have to be redrawn
+            self.redraw_map = False
+            self.render_map()
+
+        objects_moved = self.objects_changed
+        if objects_moved:
+            self.objects_changed = False
+            self.render_objects()
+
+        # Blit only the part of con that changed to the root console, which
+        # keeps what it was last given. The rows under the panel stay empty.
+        if self.dirty_rect is not None:
+            (x1, y1, x2, y2) = self.dirty_rect
+            y2 = min(y2, PANEL_Y - 1)
+            libtcod.console_blit(con, x1, y1, x2 - x1 + 1, y2 - y1 + 1, 0, x1, y1)
+            self.dirty_rect = None
+
+        self.render_panel(mouse, objects_moved)
+        self.needs_redraw = False
+
+    def render_panel(self, mouse, objects_moved):
+        # Redraw and blit only the panel regions whose inputs changed since
+        # they were last drawn, so a quiet frame does no text work at all
+        panel = self.panel
+        hud = self.hud
+
+        # The names under the mouse change when the mouse goes to another
+        # cell or something moved
+        hover = (mouse.cx, mouse.cy) if mouse is not None else None
+        if objects_moved or hover != self.hover or hud['names'] is None:
+            self.hover = hover
+            names = self.get_names_under_mouse(mouse)
+            if names != hud['names']:
+                hud['names'] = names
+                self.clear_panel_region('names')
+                # Display names of objects under the mouse
+                libtcod.console_draw_batch(panel, [(1, 0, names, libtcod.light_gray, None)])
+                self.blit_panel_region('names')
+
+        fighter = self.player.fighter
+        hp = (fighter.hp, fighter.max_hp)
+        if hp != hud['hp']:
+            hud['hp'] = hp
+            self.clear_panel_region('hp')
+            # Show the players stats
+            self.render_bar(1, 1, BAR_WIDTH, 'HP', fighter.hp, fighter.max_hp, libtcod.light_red, libtcod.darker_red)
+            self.blit_panel_region('hp')
+
+        if self.game_msgs.count != hud['messages']:
+            hud['messages'] = self.game_msgs.count
+            self.clear_panel_region('messages')
+            # print the game messages, one line each
+            lines = [(MSG_X, y, line, color, None) for y, (line, color) in enumerate(self.game_msgs, 1)]
+            libtcod.console_draw_batch(panel, lines)
+            self.blit_panel_region('messages')
+
+    def clear_panel_region(self, name):
+        (x, y, w, h) = PANEL_REGIONS[name]
+        libtcod.console_set_default_background(self.panel, libtcod.black)
+        libtcod.console_rect(self.panel, x, y, w, h, True, libtcod.BKGND_SET)
+
+    def blit_panel_region(self, name):
+        # Blit one region of panel to its place on the root console
+        (x, y, w, h) = PANEL_REGIONS[name]
+        libtcod.console_blit(self.panel, x, y, w, h, 0, x, PANEL_Y + y)
+
+    def get_names_under_mouse(self, mouse):
+        if mouse is None:
+            return ''
+        (x,y) = (mouse.cx + self.camera_x, mouse.cy + self.camera_y)
+        # Create a list of all objects all the mouses position and in the player FOV
+        names = [obj.name for obj in self.occupancy.objects_at(x, y)
+                if self.is_in_fov(obj.x, obj.y)]
+        names = ', '.join(names) # join names seperated by comma
+        return names.capitalize()
+
+    def render_bar(self, x, y, total_width, name, value, maximum, bar_color, back_color):
+        # Render a bar (HP, experience, etc) first calculate the width of the bar
+        panel = self.panel
+        bar_width = int(float(value) / maximum * total_width)
+
+        # Render the background first
+        libtcod.console_set_default_background(panel, back_color)
+        libtcod.console_rect(panel, x, y, total_width, 1, False, libtcod.BKGND_SCREEN)
+
+        # Now render the bar on top
+        libtcod.console_set_default_background(panel, bar_color)
+        if bar_width > 0:
+            libtcod.console_rect(panel, x, y, bar_width, 1, False, libtcod.BKGND_SCREEN)
+
+        # Finaly some centered text with values
+        libtcod.console_set_default_foreground(panel, libtcod.white)
+        libtcod.console_print_ex(panel, x + total_width // 2, y, libtcod.BKGND_NONE, libtcod.CENTER, name + ': ' + str(value) + '/' + str(maximum))
+
+def handle_keys(session, key):
     #key = libtcod.console_check_for_keypress() # real time
     #key = libtcod.console_wait_for_keypress(True) # for turn based
     if key.vk == libtcod.KEY_ENTER and key.lalt:
         # Alt+Enter toggle fullscreen
         libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())
+        session.needs_redraw = True
     elif key.vk == libtcod.KEY_ESCAPE:
         return 'exit' #exit game
-    if game_state == 'playing':
+    if session.game_state == 'playing':
         #movement keys
         if key.vk == libtcod.KEY_UP or key.c == ord('w'):
-            #player.move(0, -1)
-            player_move_or_attack(0, -1)
-            #fov_recompute = True
+            return session.step(('move', 0, -1))
         elif key.vk == libtcod.KEY_DOWN or key.c == ord('s'):
-            player_move_or_attack(0, 1)
-            #player.move(0, 1)
-            #fov_recompute = True
+            return session.step(('move', 0, 1))
         elif key.vk == libtcod.KEY_LEFT or key.c == ord('a'):
-            player_move_or_attack(-1, 0)
-            #player.move(-1, 0)
-            #fov_recompute = True
+            return session.step(('move', -1, 0))
         elif key.vk == libtcod.KEY_RIGHT or key.c == ord('d'):
-            player_move_or_attack(1, 0)
-            #player.move(1, 0)
-            #fov_recompute = True
+            return session.step(('move', 1, 0))
         else:
             # Test for other keys
             key_char = chr(key.c)
 
             if key_char == 'g':
                 # Pick up an item
-                for object in objects: # Look for an item in the players tile
-                    if object.x == player.x and object.y == player.y and object.item:
-                        object.item.pick_up()
-                        break
+                session.step(('pickup',))
             if key_char == 'i':
                 # Show the inventory
-                chosen_item = inventory_menu("Press the key next to an item to use it, or any other key to cancel.\n")
-                if chosen_item is not None:
-                    chosen_item.use()
+                index = inventory_menu(session, "Press the key next to an item to use it, or any other key to cancel.\n")
+                if index is not None:
+                    session.step(('use', index))
+            if key_char == 'm':
+                # Scroll through past messages
+                history_viewer(session)
             return 'didnt-take-turn'
 
-def render_bar(x, y, total_width, name, value, maximum, bar_color, back_color):
-    # Render a bar (HP, experience, etc) first calculate the width of the bar
-    bar_width = int(float(value) / maximum * total_width)
-
-    # Render the background first
-    libtcod.console_set_default_background(panel, back_color)
-    libtcod.console_rect(panel, x, y, total_width, 1, False, libtcod.BKGND_SCREEN)
-
-    # Now render the bar on top
-    libtcod.console_set_default_background(panel, bar_color)
-    if bar_width > 0:
-        libtcod.console_rect(panel, x, y, bar_width, 1, False, libtcod.BKGND_SCREEN)
-
-    # Finaly some centered text with values
-    libtcod.console_set_default_foreground(panel, libtcod.white)
-    libtcod.console_print_ex(panel, x + total_width / 2, y, libtcod.BKGND_NONE, libtcod.CENTER, name + ': ' + str(value) + '/' + str(maximum))
-
-def menu(header, options, width):
+def render_menu(header, options, width):
+    # Draw the menu window onto the root console
     if len(options) > 26:
         raise ValueError('Cannot have a menu with more than 26 options')
 
     # Calculate the total height for the header (after auto-wrap) and one line per option
-    header_height = libtcod.console_get_height_rect(con, 0, 0, width, SCREEN_HEIGHT, header)
+    header_height = libtcod.console_get_height_rect(0, 0, 0, width, SCREEN_HEIGHT, header)
     height = len(options) + header_height
 
     # Create an offscreen console that represents the menu's window
@@ -553,16 +1209,22 @@ def menu(header, options, width):
     # Print all options
     y = header_height
     letter_index = ord('a')
+    lines = []
     for option_text in options:
         text = '(' + chr(letter_index) + ') ' + option_text
-        libtcod.console_print_ex(window, 0, y, libtcod.BKGND_NONE, libtcod.LEFT, text)
+        lines.append((0, y, text, libtcod.white, None))
         y += 1
         letter_index += 1
+    libtcod.console_draw_batch(window, lines)
 
     # Blit the contents of 'window' to the root console
-    x = SCREEN_WIDTH/2 - width/2
-    y = SCREEN_HEIGHT/2 - height/2
+    x = SCREEN_WIDTH // 2 - width // 2
+    y = SCREEN_HEIGHT // 2 - height // 2
     libtcod.console_blit(window, 0, 0, width, height, 0, x, y, 1.0, 0.7)
+    libtcod.console_delete(window)
+
+def menu(header, options, width):
+    render_menu(header, options, width)
 
     # Present the root console to the player and wait for a key press
     libtcod.console_flush()
@@ -575,79 +1237,123 @@ def menu(header, options, width):
 
     return None
 
-def inventory_menu(header):
+def inventory_menu(session, header):
     # Show a menu with each item of the inventory as an option
-    if len(inventory) == 0:
+    if len(session.inventory) == 0:
         options = ['Inventory is Empty']
     else:
-        options = [item.name for item in inventory]
+        options = [item.name for item in session.inventory]
 
     index = menu(header, options, INVENTORY_WIDTH)
+    # The menu was drawn straight on the root console, over the map
+    session.mark_dirty(0, 0, SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
 
-    #If an item was chosen return it
-    if index is None or len(inventory) == 0:
+    #If an item was chosen return its index
+    if index is None or len(session.inventory) == 0:
         return None
-    return inventory[index].item
+    return index
+
+def render_history(session, scroll):
+    # Draw one page of the message history onto the root console, scroll
+    # lines up from the newest message
+    width = HISTORY_WIDTH
+    height = HISTORY_HEIGHT
+    window = libtcod.console_new(width, height)
+
+    lines = [(0, 0, 'Message history: up/down and page up/down to scroll, any other key to close', libtcod.white, None)]
+    y = 2
+    for (line, color) in session.game_msgs.history_lines(scroll, height - 2, width):
+        lines.append((0, y, line, color, None))
+        y += 1
+    libtcod.console_draw_batch(window, lines)
+
+    x = SCREEN_WIDTH // 2 - width // 2
+    y = SCREEN_HEIGHT // 2 - height // 2
+    libtcod.console_blit(window, 0, 0, width, height, 0, x, y, 1.0, 0.9)
+    libtcod.console_delete(window)
+
+def history_viewer(session):
+    # Page through the message history until a key other than the scroll
+    # keys is pressed. Lines are only wrapped for the page on screen.
+    page = HISTORY_HEIGHT - 2
+    scroll = 0
+    while True:
+        # Blit the game below again so the last page does not show through
+        session.mark_dirty(0, 0, SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
+        session.render_all()
+        render_history(session, scroll)
+        libtcod.console_flush()
+
+        key = libtcod.console_wait_for_keypress(True)
+        if key.vk == libtcod.KEY_UP:
+            scroll += 1
+        elif key.vk == libtcod.KEY_DOWN:
+            scroll -= 1
+        elif key.vk == libtcod.KEY_PAGEUP:
+            scroll += page
+        elif key.vk == libtcod.KEY_PAGEDOWN:
+            scroll -= page
+        else:
+            break
+        # Stop once the oldest line is at the top of the page
+        while scroll > 0 and len(session.game_msgs.history_lines(scroll, page, HISTORY_WIDTH)) < page:
+            scroll -= 1
+        scroll = max(0, scroll)
+    # The viewer was drawn straight on the root console, over the map
+    session.mark_dirty(0, 0, SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1)
 
 #################################################
 # GAME LOOP
 #################################################
-libtcod.console_set_custom_font('arial10x10.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
-libtcod.console_init_root(SCREEN_WIDTH, SCREEN_HEIGHT, 'Escape', False)
-libtcod.sys_set_fps(LIMIT_FPS)
-con = libtcod.console_new(SCREEN_WIDTH, SCREEN_HEIGHT)
-panel = libtcod.console_new(SCREEN_WIDTH, PANEL_HEIGHT)
-
-# The Player.
-#player = Object(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, '@', libtcod.white)
-fighter_component = Fighter(hp=30, defense=2, power=5, death_function=player_death)
-player = Object(0, 0, '@', libtcod.white, 'player', blocks=True, fighter=fighter_component)
-# The NPC
-#npc = Object(SCREEN_WIDTH/2 - 5, SCREEN_HEIGHT/2, '@', libtcod.yellow)
-# Game objects
-objects = [player]
-# Generate map
-make_map()
-
-fov_map = libtcod.map_new(MAP_WIDTH, MAP_HEIGHT)
-fov_recompute = True
-for y in range(MAP_HEIGHT):
-    for x in range(MAP_WIDTH):
-        libtcod.map_set_properties(fov_map, x, y, not map[x][y].block_sight, not map[x][y].blocked)
-
-fov_recompute = True
-game_state = 'playing'
-player_action = None
-
-# Create a list of game messages and thier colors, starts empty
-game_msgs = []
-
-message('Welcome stranger! Prepare to perish in the Tombs of the Ancient Kings.', libtcod.red)
-mouse = libtcod.Mouse()
-key = libtcod.Key()
-
-inventory = []
-
-# Main Loop
-while not libtcod.console_is_window_closed():
-    libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS|libtcod.EVENT_MOUSE,key,mouse)
-    # Render the screen
-    render_all()
-
-    libtcod.console_flush()
+def main():
+    libtcod.console_set_custom_font('arial10x10.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+    libtcod.console_init_root(SCREEN_WIDTH, SCREEN_HEIGHT, 'Escape', False)
+    libtcod.sys_set_fps(LIMIT_FPS)
 
-    # Erase all objects at their old positions, before they move
-    for object in objects:
-        object.clear()
+    session = GameSession()
+    session.enable_rendering()
 
-    # Handle keys and exit the game if needed.
-    player_action = handle_keys()
-    if player_action == 'exit':
-        break
-
-    if game_state == 'playing' and player_action != 'didnt-take-turn':
-        for object in objects:
-            if object.ai:
-                object.ai.take_turn()
+    mouse = libtcod.Mouse()
+    key = libtcod.Key()
 
+    if TURN_BASED:
+        turn_based_loop(session, key, mouse)
+    else:
+        real_time_loop(session, key, mouse)
+
+def turn_based_loop(session, key, mouse):
+    # Draw, then sleep until something happens. Nothing is repainted while
+    # the player is thinking, or when the mouse moves within the same cell.
+    hover = None
+    while not libtcod.console_is_window_closed():
+        if session.needs_redraw:
+            session.render_all(mouse)
+            libtcod.console_flush()
+
+        event = libtcod.sys_wait_for_event(libtcod.EVENT_KEY_PRESS|libtcod.EVENT_MOUSE, key, mouse, False)
+        if event & libtcod.EVENT_KEY_PRESS:
+            # Handle keys and exit the game if needed.
+            player_action = handle_keys(session, key)
+            if player_action == 'exit':
+                break
+        if (mouse.cx, mouse.cy) != hover:
+            # The names under the mouse may have changed
+            hover = (mouse.cx, mouse.cy)
+            session.needs_redraw = True
+
+def real_time_loop(session, key, mouse):
+    # Main Loop
+    while not libtcod.console_is_window_closed():
+        libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS|libtcod.EVENT_MOUSE,key,mouse)
+        # Render the screen
+        session.render_all(mouse)
+
+        libtcod.console_flush()
+
+        # Handle keys and exit the game if needed.
+        player_action = handle_keys(session, key)
+        if player_action == 'exit':
+            break
 
+if __name__ == '__main__':
+    main()
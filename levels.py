@@ -0,0 +1,135 @@
+# Generated levels as plain data, and an on-disk cache for them.
+#
+# A Level holds everything make_map produces: the tile planes, the rooms,
+# what spawns where and where the player starts. It has no libtcod or game
+# objects in it, so it can be stored, sent to another process and turned
+# back into a playable GameSession.
+#
+# Cached levels travel with replays and bug reports, so reading one must
+# not run anything: the format is a JSON header (numbers and strings only)
+# followed by the raw tile planes, and anything else is rejected.
+#
+# json and tempfile are imported by the functions using them: together
+# they take longer to import than the rest of the game, which only needs
+# them once levels are cached.
+
+import os
+import struct
+import zlib
+
+from tilemap import TileMap
+
+# Kinds of object a level can spawn, all known to escape.spawn_object
+SPAWN_KINDS = frozenset(['orc', 'troll', 'healing_potion'])
+
+# First bytes of a serialized level, with the format version
+_MAGIC = b'ESCLVL1\n'
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+class Level(object):
+    def __init__(self, seed, version, width, height):
+        self.seed = seed
+        # Version of the generator that made the level
+        self.version = version
+        self.map = TileMap(width, height)
+        # (x1, y1, x2, y2) of every room, in the order they were dug
+        self.rooms = []
+        # (kind, x, y) of every object, in the order they were placed
+        self.spawns = []
+        self.player_x = 0
+        self.player_y = 0
+
+    def to_bytes(self):
+        # Compact serialized form: the tile planes compress to almost nothing
+        import json
+        header = json.dumps({
+            'seed': self.seed, 'version': self.version,
+            'width': self.map.width, 'height': self.map.height,
+            'rooms': self.rooms, 'spawns': self.spawns,
+            'player': [self.player_x, self.player_y],
+        }, separators=(',', ':')).encode('ascii')
+        data = (_MAGIC + struct.pack('<I', len(header)) + header +
+                bytes(self.map.blocked) + bytes(self.map.block_sight))
+        return zlib.compress(data)
+
+    @staticmethod
+    def from_bytes(data):
+        # Raises ValueError if data is not a level written by to_bytes
+        import json
+        try:
+            data = zlib.decompress(data)
+            if data[:len(_MAGIC)] != _MAGIC:
+                raise ValueError('Not a serialized level')
+            start = len(_MAGIC) + 4
+            (size,) = struct.unpack('<I', data[len(_MAGIC):start])
+            header = json.loads(data[start:start + size].decode('ascii'))
+            planes = data[start + size:]
+
+            (seed, version, width, height) = [header[k] for k in ('seed', 'version', 'width', 'height')]
+            (player_x, player_y) = header['player']
+            rooms = [tuple(room) for room in header['rooms']]
+            spawns = [tuple(spawn) for spawn in header['spawns']]
+        except (zlib.error, struct.error, UnicodeError, KeyError, TypeError) as e:
+            raise ValueError('Not a serialized level: %s' % e)
+        numbers = [seed, version, width, height, player_x, player_y]
+        numbers.extend(v for room in rooms for v in room)
+        numbers.extend(v for spawn in spawns for v in spawn[1:])
+        if (not all(_is_int(v) for v in numbers) or width <= 0 or height <= 0 or
+                len(planes) != 2 * width * height or
+                not all(len(room) == 4 for room in rooms) or
+                not all(len(spawn) == 3 and isinstance(spawn[0], type(u'')) for spawn in spawns)):
+            raise ValueError('Not a serialized level: bad header or planes')
+        def inside(x, y):
+            return 0 <= x < width and 0 <= y < height
+        if (not inside(player_x, player_y) or
+                not all(inside(x1, y1) and inside(x2, y2) and x1 <= x2 and y1 <= y2
+                        for (x1, y1, x2, y2) in rooms) or
+                not all(kind in SPAWN_KINDS and inside(x, y) for (kind, x, y) in spawns)):
+            raise ValueError('Not a serialized level: unknown spawn or position outside the map')
+
+        level = Level(seed, version, width, height)
+        level.map.blocked[:] = planes[:width * height]
+        level.map.block_sight[:] = planes[width * height:]
+        level.rooms = rooms
+        level.spawns = [(str(kind), x, y) for (kind, x, y) in spawns]
+        level.player_x = player_x
+        level.player_y = player_y
+        return level
+
+class LevelCache(object):
+    # Directory of serialized levels keyed by generator version, seed and
+    # size: the same seed gives a different level at another size
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, version, seed, width, height):
+        return os.path.join(self.directory, 'level-v%d-%d-%dx%d.bin' % (version, seed, width, height))
+
+    def load(self, version, seed, width, height):
+        # The cached level, or None if it was never stored. A file that
+        # cannot be read or holds anything but that level is a miss too, so
+        # the level gets generated again.
+        try:
+            with open(self.path(version, seed, width, height), 'rb') as f:
+                level = Level.from_bytes(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+        if (level.version, level.seed, level.map.width, level.map.height) != (version, seed, width, height):
+            return None
+        return level
+
+    def store(self, level):
+        self.store_data(level.version, level.seed, level.map.width, level.map.height, level.to_bytes())
+
+    def store_data(self, version, seed, width, height, data):
+        # Store a level already serialized with Level.to_bytes
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        # Write to a temporary file first so readers never see half a level
+        import tempfile
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp, self.path(version, seed, width, height))
@@ -0,0 +1,171 @@
+#
+# libtcod 1.5.1 python wrapper
+# Copyright (c) 2008,2009,2010 Jice & Mingos
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The name of Jice or Mingos may not be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY JICE AND MINGOS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL JICE OR MINGOS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# The bsp module of the wrapper, imported by libtcodpy the first time
+# one of its names is used.
+
+from ctypes import *
+
+from libtcodpy import _lib, c_bool
+
+############################
+# bsp module
+############################
+class _CBsp(Structure):
+    _fields_ = [('next', c_void_p),
+                ('father', c_void_p),
+                ('son', c_void_p),
+                ('x', c_int),
+                ('y', c_int),
+                ('w', c_int),
+                ('h', c_int),
+                ('position', c_int),
+                ('level', c_uint8),
+                ('horizontal', c_bool),
+                ]
+
+_lib.TCOD_bsp_new_with_size.restype = POINTER(_CBsp)
+_lib.TCOD_bsp_left.restype = POINTER(_CBsp)
+_lib.TCOD_bsp_right.restype = POINTER(_CBsp)
+_lib.TCOD_bsp_father.restype = POINTER(_CBsp)
+_lib.TCOD_bsp_is_leaf.restype = c_bool
+_lib.TCOD_bsp_contains.restype = c_bool
+_lib.TCOD_bsp_find_node.restype = POINTER(_CBsp)
+
+BSP_CBK_FUNC = CFUNCTYPE(c_int, c_void_p, c_void_p)
+
+# python class encapsulating the _CBsp pointer
+class Bsp(object):
+    def __init__(self, cnode):
+        pcbsp = cast(cnode, POINTER(_CBsp))
+        self.p = pcbsp
+
+    def getx(self):
+        return self.p.contents.x
+    def setx(self, value):
+        self.p.contents.x = value
+    x = property(getx, setx)
+
+    def gety(self):
+        return self.p.contents.y
+    def sety(self, value):
+        self.p.contents.y = value
+    y = property(gety, sety)
+
+    def getw(self):
+        return self.p.contents.w
+    def setw(self, value):
+        self.p.contents.w = value
+    w = property(getw, setw)
+
+    def geth(self):
+        return self.p.contents.h
+    def seth(self, value):
+        self.p.contents.h = value
+    h = property(geth, seth)
+
+    def getpos(self):
+        return self.p.contents.position
+    def setpos(self, value):
+        self.p.contents.position = value
+    position = property(getpos, setpos)
+
+    def gethor(self):
+        return self.p.contents.horizontal
+    def sethor(self,value):
+        self.p.contents.horizontal = value
+    horizontal = property(gethor, sethor)
+
+    def getlev(self):
+        return self.p.contents.level
+    def setlev(self,value):
+        self.p.contents.level = value
+    level = property(getlev, setlev)
+
+
+def bsp_new_with_size(x, y, w, h):
+    return Bsp(_lib.TCOD_bsp_new_with_size(x, y, w, h))
+
+def bsp_split_once(node, horizontal, position):
+    _lib.TCOD_bsp_split_once(node.p, c_int(horizontal), position)
+
+def bsp_split_recursive(node, randomizer, nb, minHSize, minVSize, maxHRatio,
+                        maxVRatio):
+    _lib.TCOD_bsp_split_recursive(node.p, randomizer, nb, minHSize, minVSize,
+                                  c_float(maxHRatio), c_float(maxVRatio))
+
+def bsp_resize(node, x, y, w, h):
+    _lib.TCOD_bsp_resize(node.p, x, y, w, h)
+
+def bsp_left(node):
+    return Bsp(_lib.TCOD_bsp_left(node.p))
+
+def bsp_right(node):
+    return Bsp(_lib.TCOD_bsp_right(node.p))
+
+def bsp_father(node):
+    return Bsp(_lib.TCOD_bsp_father(node.p))
+
+def bsp_is_leaf(node):
+    return _lib.TCOD_bsp_is_leaf(node.p)
+
+def bsp_contains(node, cx, cy):
+    return _lib.TCOD_bsp_contains(node.p, cx, cy)
+
+def bsp_find_node(node, cx, cy):
+    return Bsp(_lib.TCOD_bsp_find_node(node.p, cx, cy))
+
+def _bsp_traverse(node, callback, userData, func):
+    # convert the c node into a python node
+    #before passing it to the actual callback
+    def node_converter(cnode, data):
+        node = Bsp(cnode)
+        return callback(node, data)
+    cbk_func = BSP_CBK_FUNC(node_converter)
+    func(node.p, cbk_func, userData)
+
+def bsp_traverse_pre_order(node, callback, userData=0):
+    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_pre_order)
+
+def bsp_traverse_in_order(node, callback, userData=0):
+    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_in_order)
+
+def bsp_traverse_post_order(node, callback, userData=0):
+    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_post_order)
+
+def bsp_traverse_level_order(node, callback, userData=0):
+    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_level_order)
+
+def bsp_traverse_inverted_level_order(node, callback, userData=0):
+    _bsp_traverse(node, callback, userData,
+                  _lib.TCOD_bsp_traverse_inverted_level_order)
+
+def bsp_remove_sons(node):
+    _lib.TCOD_bsp_remove_sons(node.p)
+
+def bsp_delete(node):
+    _lib.TCOD_bsp_delete(node.p)
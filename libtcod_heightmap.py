@@ -0,0 +1,213 @@
+#
+# libtcod 1.5.1 python wrapper
+# Copyright (c) 2008,2009,2010 Jice & Mingos
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The name of Jice or Mingos may not be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY JICE AND MINGOS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL JICE OR MINGOS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# The heightmap module of the wrapper, imported by libtcodpy the first time
+# one of its names is used.
+
+from ctypes import *
+
+from libtcodpy import _lib, c_bool, numpy_available
+
+if numpy_available:
+    import numpy
+
+############################
+# heightmap module
+############################
+class _CHeightMap(Structure):
+    _fields_=[('w', c_int),
+              ('h', c_int),
+              ('values', POINTER(c_float)),
+              ]
+
+_lib.TCOD_heightmap_new.restype = POINTER(_CHeightMap)
+_lib.TCOD_heightmap_get_value.restype = c_float
+_lib.TCOD_heightmap_has_land_on_border.restype = c_bool
+# the noise is a pointer, it must not be truncated to a C int
+_lib.TCOD_heightmap_add_fbm.argtypes = [POINTER(_CHeightMap), c_void_p] + [c_float] * 7
+_lib.TCOD_heightmap_scale_fbm.argtypes = [POINTER(_CHeightMap), c_void_p] + [c_float] * 7
+
+class HeightMap(object):
+    def __init__(self, chm):
+        pchm = cast(chm, POINTER(_CHeightMap))
+        self.p = pchm
+        # the buffer holding the values of a heightmap made with
+        # heightmap_from_array, None when libtcod owns them
+        self.array = None
+
+    def getw(self):
+        return self.p.contents.w
+    def setw(self, value):
+        self.p.contents.w = value
+    w = property(getw, setw)
+
+    def geth(self):
+        return self.p.contents.h
+    def seth(self, value):
+        self.p.contents.h = value
+    h = property(geth, seth)
+
+def heightmap_new(w, h):
+    phm = _lib.TCOD_heightmap_new(w, h)
+    return HeightMap(phm)
+
+def heightmap_set_value(hm, x, y, value):
+    _lib.TCOD_heightmap_set_value(hm.p, x, y, c_float(value))
+
+def heightmap_add(hm, value):
+    _lib.TCOD_heightmap_add(hm.p, c_float(value))
+
+def heightmap_scale(hm, value):
+    _lib.TCOD_heightmap_scale(hm.p, c_float(value))
+
+def heightmap_clear(hm):
+    _lib.TCOD_heightmap_clear(hm.p)
+
+def heightmap_clamp(hm, mi, ma):
+    _lib.TCOD_heightmap_clamp(hm.p, c_float(mi),c_float(ma))
+
+def heightmap_copy(hm1, hm2):
+    _lib.TCOD_heightmap_copy(hm1.p, hm2.p)
+
+def heightmap_normalize(hm,  mi=0.0, ma=1.0):
+    _lib.TCOD_heightmap_normalize(hm.p, c_float(mi), c_float(ma))
+
+def heightmap_lerp_hm(hm1, hm2, hm3, coef):
+    _lib.TCOD_heightmap_lerp_hm(hm1.p, hm2.p, hm3.p, c_float(coef))
+
+def heightmap_add_hm(hm1, hm2, hm3):
+    _lib.TCOD_heightmap_add_hm(hm1.p, hm2.p, hm3.p)
+
+def heightmap_multiply_hm(hm1, hm2, hm3):
+    _lib.TCOD_heightmap_multiply_hm(hm1.p, hm2.p, hm3.p)
+
+def heightmap_add_hill(hm, x, y, radius, height):
+    _lib.TCOD_heightmap_add_hill(hm.p, c_float( x), c_float( y),
+                                 c_float( radius), c_float( height))
+
+def heightmap_dig_hill(hm, x, y, radius, height):
+    _lib.TCOD_heightmap_dig_hill(hm.p, c_float( x), c_float( y),
+                                 c_float( radius), c_float( height))
+
+def heightmap_rain_erosion(hm, nbDrops, erosionCoef, sedimentationCoef, rnd=0):
+    _lib.TCOD_heightmap_rain_erosion(hm.p, nbDrops, c_float( erosionCoef),
+                                     c_float( sedimentationCoef), rnd)
+
+def heightmap_kernel_transform(hm, kernelsize, dx, dy, weight, minLevel,
+                               maxLevel):
+    FARRAY = c_float * kernelsize
+    IARRAY = c_int * kernelsize
+    cdx = IARRAY(*dx)
+    cdy = IARRAY(*dy)
+    cweight = FARRAY(*weight)
+    _lib.TCOD_heightmap_kernel_transform(hm.p, kernelsize, cdx, cdy, cweight,
+                                         c_float(minLevel), c_float(maxLevel))
+
+def heightmap_add_voronoi(hm, nbPoints, nbCoef, coef, rnd=0):
+    FARRAY = c_float * nbCoef
+    ccoef = FARRAY(*coef)
+    _lib.TCOD_heightmap_add_voronoi(hm.p, nbPoints, nbCoef, ccoef, rnd)
+
+def heightmap_add_fbm(hm, noise, mulx, muly, addx, addy, octaves, delta, scale):
+    _lib.TCOD_heightmap_add_fbm(hm.p, noise, c_float(mulx), c_float(muly),
+                                c_float(addx), c_float(addy),
+                                c_float(octaves), c_float(delta),
+                                c_float(scale))
+def heightmap_scale_fbm(hm, noise, mulx, muly, addx, addy, octaves, delta,
+                        scale):
+    _lib.TCOD_heightmap_scale_fbm(hm.p, noise, c_float(mulx), c_float(muly),
+                                  c_float(addx), c_float(addy),
+                                  c_float(octaves), c_float(delta),
+                                  c_float(scale))
+def heightmap_dig_bezier(hm, px, py, startRadius, startDepth, endRadius,
+                         endDepth):
+    IARRAY = c_int * 4
+    cpx = IARRAY(*px)
+    cpy = IARRAY(*py)
+    _lib.TCOD_heightmap_dig_bezier(hm.p, cpx, cpy, c_float(startRadius),
+                                   c_float(startDepth), c_float(endRadius),
+                                   c_float(endDepth))
+
+def heightmap_get_value(hm, x, y):
+    return _lib.TCOD_heightmap_get_value(hm.p, x, y)
+
+def heightmap_get_interpolated_value(hm, x, y):
+    return _lib.TCOD_heightmap_get_interpolated_value(hm.p, c_float(x),
+                                                     c_float(y))
+
+def heightmap_get_slope(hm, x, y):
+    return _lib.TCOD_heightmap_get_slope(hm.p, x, y)
+
+def heightmap_get_normal(hm, x, y, waterLevel):
+    FARRAY = c_float * 3
+    cn = FARRAY()
+    _lib.TCOD_heightmap_get_normal(hm.p, c_float(x), c_float(y), cn,
+                                   c_float(waterLevel))
+    return cn[0], cn[1], cn[2]
+
+def heightmap_count_cells(hm, mi, ma):
+    return _lib.TCOD_heightmap_count_cells(hm.p, c_float(mi), c_float(ma))
+
+def heightmap_has_land_on_border(hm, waterlevel):
+    return _lib.TCOD_heightmap_has_land_on_border(hm.p, c_float(waterlevel))
+
+def heightmap_get_minmax(hm):
+    mi = c_float()
+    ma = c_float()
+    _lib.TCOD_heightmap_get_minmax(hm.p, byref(mi), byref(ma))
+    return mi.value, ma.value
+
+# zero-copy access to the values, stored row by row (x + y * w).
+# heightmap_values gives a view of the memory of a heightmap: a (h, w)
+# float32 numpy array if numpy is installed, else a flat ctypes float
+# array. The view is only valid until heightmap_delete.
+def heightmap_values(hm):
+    c = hm.p.contents
+    if numpy_available:
+        return numpy.ctypeslib.as_array(c.values, shape=(c.h, c.w))
+    return cast(c.values, POINTER(c_float * (c.w * c.h))).contents
+
+# heightmap_from_array goes the other way: a heightmap working on the
+# memory of a writable buffer of C floats, a (h, w) float32 numpy array or
+# any buffer of w * h floats (array('f'), ctypes array) with w and h given.
+# The buffer is kept alive by the heightmap.
+def heightmap_from_array(values, w=None, h=None):
+    if w is None:
+        (h, w) = values.shape
+    view = memoryview(values)
+    if not view.format.endswith('f') or not view.c_contiguous or view.nbytes != 4 * w * h:
+        raise TypeError('values must be a contiguous buffer of w * h C floats.')
+    buf = (c_float * (w * h)).from_buffer(values)
+    chm = _CHeightMap(w, h, cast(buf, POINTER(c_float)))
+    hm = HeightMap(pointer(chm))
+    hm.array = buf
+    return hm
+
+def heightmap_delete(hm):
+    # the values of a heightmap made from an array belong to the array
+    if hm.array is None:
+        _lib.TCOD_heightmap_delete(hm.p)
@@ -0,0 +1,58 @@
+#
+# libtcod 1.5.1 python wrapper
+# Copyright (c) 2008,2009,2010 Jice & Mingos
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The name of Jice or Mingos may not be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY JICE AND MINGOS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL JICE OR MINGOS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# The name generator module of the wrapper, imported by libtcodpy the first time
+# one of its names is used.
+
+from ctypes import *
+
+from libtcodpy import _lib
+
+############################
+# name generator module
+############################
+_lib.TCOD_namegen_generate.restype = c_char_p
+_lib.TCOD_namegen_generate_custom.restype = c_char_p
+
+def namegen_parse(filename,random=0) :
+    _lib.TCOD_namegen_parse(filename,random)
+
+def namegen_generate(name) :
+    return _lib.TCOD_namegen_generate(name, 0)
+
+def namegen_generate_custom(name, rule) :
+    return _lib.TCOD_namegen_generate(name, rule, 0)
+
+def namegen_get_sets():
+    nb=_lib.TCOD_namegen_get_nb_sets_wrapper()
+    SARRAY = c_char_p * nb;
+    setsa = SARRAY()
+    _lib.TCOD_namegen_get_sets_wrapper(setsa)
+    return list(setsa)
+
+def namegen_destroy() :
+    _lib.TCOD_namegen_destroy()
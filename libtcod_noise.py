@@ -0,0 +1,137 @@
+#
+# libtcod 1.5.1 python wrapper
+# Copyright (c) 2008,2009,2010 Jice & Mingos
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The name of Jice or Mingos may not be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY JICE AND MINGOS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL JICE OR MINGOS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# The noise module of the wrapper, imported by libtcodpy the first time
+# one of its names is used.
+
+from array import array
+from ctypes import *
+
+from libtcodpy import _lib, numpy_available
+from libtcod_heightmap import heightmap_new, heightmap_add_fbm, heightmap_delete
+
+if numpy_available:
+    import numpy
+
+############################
+# noise module
+############################
+# the noise is an opaque pointer, it must keep all its bits on 64 bits
+# systems
+_lib.TCOD_noise_new.restype = c_void_p
+_lib.TCOD_noise_new.argtypes = [c_int, c_float, c_float, c_void_p]
+_lib.TCOD_noise_set_type.argtypes = [c_void_p, c_int]
+_lib.TCOD_noise_get.restype = c_float
+_lib.TCOD_noise_get.argtypes = [c_void_p, POINTER(c_float)]
+_lib.TCOD_noise_get_ex.restype = c_float
+_lib.TCOD_noise_get_ex.argtypes = [c_void_p, POINTER(c_float), c_int]
+_lib.TCOD_noise_get_fbm.restype = c_float
+_lib.TCOD_noise_get_fbm.argtypes = [c_void_p, POINTER(c_float), c_float]
+_lib.TCOD_noise_get_fbm_ex.restype = c_float
+_lib.TCOD_noise_get_fbm_ex.argtypes = [c_void_p, POINTER(c_float), c_float, c_int]
+_lib.TCOD_noise_get_turbulence.restype = c_float
+_lib.TCOD_noise_get_turbulence.argtypes = [c_void_p, POINTER(c_float), c_float]
+_lib.TCOD_noise_get_turbulence_ex.restype = c_float
+_lib.TCOD_noise_get_turbulence_ex.argtypes = [c_void_p, POINTER(c_float), c_float, c_int]
+_lib.TCOD_noise_delete.argtypes = [c_void_p]
+
+NOISE_DEFAULT_HURST = 0.5
+NOISE_DEFAULT_LACUNARITY = 2.0
+
+NOISE_DEFAULT = 0
+NOISE_PERLIN = 1
+NOISE_SIMPLEX = 2
+NOISE_WAVELET = 4
+
+_NOISE_PACKER_FUNC = (None,
+                      (c_float * 1),
+                      (c_float * 2),
+                      (c_float * 3),
+                      (c_float * 4),
+                      )
+
+def noise_new(dim, h=NOISE_DEFAULT_HURST, l=NOISE_DEFAULT_LACUNARITY, random=0):
+    return _lib.TCOD_noise_new(dim, h, l, random)
+
+def noise_set_type(n, typ) :
+    _lib.TCOD_noise_set_type(n,typ)
+
+def noise_get(n, f, typ=NOISE_DEFAULT):
+    return _lib.TCOD_noise_get_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), typ)
+
+def noise_get_fbm(n, f, oc, typ=NOISE_DEFAULT):
+    return _lib.TCOD_noise_get_fbm_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), oc, typ)
+
+def noise_get_turbulence(n, f, oc, typ=NOISE_DEFAULT):
+    return _lib.TCOD_noise_get_turbulence_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), oc, typ)
+
+# grid sampling: the value of every cell of a w x h grid of a 2D noise, the
+# cell (x, y) being sampled at ((x + addx) * mulx, (y + addy) * muly).
+# Unlike heightmap_add_fbm, mulx and muly are per cell, not per grid, so
+# grids of neighbouring chunks sampled with addx/addy set to their origin
+# join seamlessly. The result is a (h, w) float32 numpy array if numpy is
+# installed, else a flat array('f') indexed by x + y * w.
+def _noise_grid(n, get, args, w, h, mulx, muly, addx, addy):
+    values = array('f', [0.0]) * (w * h)
+    f = (c_float * 2)()
+    xs = [(x + addx) * mulx for x in range(w)]
+    i = 0
+    for y in range(h):
+        f[1] = (y + addy) * muly
+        for fx in xs:
+            f[0] = fx
+            values[i] = get(n, f, *args)
+            i += 1
+    return values
+
+def _grid_result(values, w, h):
+    if numpy_available:
+        return numpy.frombuffer(values, dtype=numpy.float32).reshape(h, w)
+    return values
+
+def noise_get_grid(n, w, h, mulx=1.0, muly=1.0, addx=0.0, addy=0.0, typ=NOISE_DEFAULT):
+    values = _noise_grid(n, _lib.TCOD_noise_get_ex, (typ,), w, h, mulx, muly, addx, addy)
+    return _grid_result(values, w, h)
+
+def noise_get_fbm_grid(n, w, h, oc, mulx=1.0, muly=1.0, addx=0.0, addy=0.0, typ=NOISE_DEFAULT):
+    if typ == NOISE_DEFAULT:
+        # libtcod has a loop in C for this one: the fbm of a heightmap
+        hm = heightmap_new(w, h)
+        heightmap_add_fbm(hm, n, mulx * w, muly * h, addx, addy, oc, 0.0, 1.0)
+        values = array('f', [0.0]) * (w * h)
+        memmove(values.buffer_info()[0], hm.p.contents.values, 4 * w * h)
+        heightmap_delete(hm)
+    else:
+        values = _noise_grid(n, _lib.TCOD_noise_get_fbm_ex, (oc, typ), w, h, mulx, muly, addx, addy)
+    return _grid_result(values, w, h)
+
+def noise_get_turbulence_grid(n, w, h, oc, mulx=1.0, muly=1.0, addx=0.0, addy=0.0, typ=NOISE_DEFAULT):
+    values = _noise_grid(n, _lib.TCOD_noise_get_turbulence_ex, (oc, typ), w, h, mulx, muly, addx, addy)
+    return _grid_result(values, w, h)
+
+def noise_delete(n):
+    _lib.TCOD_noise_delete(n)
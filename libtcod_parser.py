@@ -0,0 +1,226 @@
+#
+# libtcod 1.5.1 python wrapper
+# Copyright (c) 2008,2009,2010 Jice & Mingos
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * The name of Jice or Mingos may not be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY JICE AND MINGOS ``AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL JICE OR MINGOS BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+# The parser module of the wrapper, imported by libtcodpy the first time
+# one of its names is used.
+
+from ctypes import *
+
+from libtcodpy import _lib, c_bool, Color
+
+############################
+# parser module
+############################
+_lib.TCOD_struct_get_name.restype = c_char_p
+_lib.TCOD_struct_is_mandatory.restype = c_bool
+_lib.TCOD_parser_get_bool_property.restype = c_bool
+_lib.TCOD_parser_get_float_property.restype = c_float
+_lib.TCOD_parser_get_string_property.restype = c_char_p
+_lib.TCOD_parser_get_color_property.restype = Color
+
+class Dice(Structure):
+    _fields_=[('nb_dices', c_int),
+              ('nb_faces', c_int),
+              ('multiplier', c_float),
+              ('addsub', c_float),
+              ]
+
+    def __repr__(self):
+        return "Dice(%d, %d, %s, %s)" % (self.nb_dices, self.nb_faces,
+                                      self.multiplier, self.addsub)
+
+class _CValue(Union):
+    _fields_=[('c',c_uint8),
+              ('i',c_int),
+              ('f',c_float),
+              ('s',c_char_p),
+              # JBR03192012 See http://bugs.python.org/issue14354 for why these are not defined as their actual types
+              ('col',c_uint8 * 3),
+              ('dice',c_int * 4),
+              ('custom',c_void_p),
+              ]
+
+_CFUNC_NEW_STRUCT = CFUNCTYPE(c_uint, c_void_p, c_char_p)
+_CFUNC_NEW_FLAG = CFUNCTYPE(c_uint, c_char_p)
+_CFUNC_NEW_PROPERTY = CFUNCTYPE(c_uint, c_char_p, c_int, _CValue)
+
+class _CParserListener(Structure):
+    _fields_=[('new_struct', _CFUNC_NEW_STRUCT),
+              ('new_flag',_CFUNC_NEW_FLAG),
+              ('new_property',_CFUNC_NEW_PROPERTY),
+              ('end_struct',_CFUNC_NEW_STRUCT),
+              ('error',_CFUNC_NEW_FLAG),
+              ]
+
+# property types
+TYPE_NONE = 0
+TYPE_BOOL = 1
+TYPE_CHAR = 2
+TYPE_INT = 3
+TYPE_FLOAT = 4
+TYPE_STRING = 5
+TYPE_COLOR = 6
+TYPE_DICE = 7
+TYPE_VALUELIST00 = 8
+TYPE_VALUELIST01 = 9
+TYPE_VALUELIST02 = 10
+TYPE_VALUELIST03 = 11
+TYPE_VALUELIST04 = 12
+TYPE_VALUELIST05 = 13
+TYPE_VALUELIST06 = 14
+TYPE_VALUELIST07 = 15
+TYPE_VALUELIST08 = 16
+TYPE_VALUELIST09 = 17
+TYPE_VALUELIST10 = 18
+TYPE_VALUELIST11 = 19
+TYPE_VALUELIST12 = 20
+TYPE_VALUELIST13 = 21
+TYPE_VALUELIST14 = 22
+TYPE_VALUELIST15 = 23
+TYPE_LIST = 1024
+
+def _convert_TCODList(clist, typ):
+    res = list()
+    for i in range(_lib.TCOD_list_size(clist)):
+        elt = _lib.TCOD_list_get(clist, i)
+        elt = cast(elt, c_void_p)
+        if typ == TYPE_BOOL:
+            elt = c_bool.from_buffer(elt).value
+        elif typ == TYPE_CHAR:
+            elt = c_char.from_buffer(elt).value
+        elif typ == TYPE_INT:
+            elt = c_int.from_buffer(elt).value
+        elif typ == TYPE_FLOAT:
+            elt = c_float.from_buffer(elt).value
+        elif typ == TYPE_STRING or TYPE_VALUELIST15 >= typ >= TYPE_VALUELIST00:
+            elt = cast(elt, c_char_p).value
+        elif typ == TYPE_COLOR:
+            elt = Color.from_buffer_copy(elt)
+        elif typ == TYPE_DICE:
+            # doesn't work
+            elt = Dice.from_buffer_copy(elt)
+        res.append(elt)
+    return res
+
+def parser_new():
+    return _lib.TCOD_parser_new()
+
+def parser_new_struct(parser, name):
+    return _lib.TCOD_parser_new_struct(parser, name)
+
+def struct_add_flag(struct, name):
+    _lib.TCOD_struct_add_flag(struct, name)
+
+def struct_add_property(struct, name, typ, mandatory):
+    _lib.TCOD_struct_add_property(struct, name, typ, c_bool(mandatory))
+
+def struct_add_value_list(struct, name, value_list, mandatory):
+    CARRAY = c_char_p * (len(value_list) + 1)
+    cvalue_list = CARRAY()
+    for i in range(len(value_list)):
+        cvalue_list[i] = cast(value_list[i], c_char_p)
+    cvalue_list[len(value_list)] = 0
+    _lib.TCOD_struct_add_value_list(struct, name, cvalue_list, c_bool(mandatory))
+
+def struct_add_list_property(struct, name, typ, mandatory):
+    _lib.TCOD_struct_add_list_property(struct, name, typ, c_bool(mandatory))
+
+def struct_add_structure(struct, sub_struct):
+    _lib.TCOD_struct_add_structure(struct, sub_struct)
+
+def struct_get_name(struct):
+    return _lib.TCOD_struct_get_name(struct)
+
+def struct_is_mandatory(struct, name):
+    return _lib.TCOD_struct_is_mandatory(struct, name)
+
+def struct_get_type(struct, name):
+    return _lib.TCOD_struct_get_type(struct, name)
+
+def parser_run(parser, filename, listener=0):
+    if listener != 0:
+        clistener=_CParserListener()
+        def value_converter(name, typ, value):
+            if typ == TYPE_BOOL:
+                return listener.new_property(name, typ, value.c == 1)
+            elif typ == TYPE_CHAR:
+                return listener.new_property(name, typ, '%c' % (value.c & 0xFF))
+            elif typ == TYPE_INT:
+                return listener.new_property(name, typ, value.i)
+            elif typ == TYPE_FLOAT:
+                return listener.new_property(name, typ, value.f)
+            elif typ == TYPE_STRING or \
+                 TYPE_VALUELIST15 >= typ >= TYPE_VALUELIST00:
+                 return listener.new_property(name, typ, value.s)
+            elif typ == TYPE_COLOR:
+                col = cast(value.col, POINTER(Color)).contents
+                return listener.new_property(name, typ, col)
+            elif typ == TYPE_DICE:
+                dice = cast(value.dice, POINTER(Dice)).contents
+                return listener.new_property(name, typ, dice)
+            elif typ & TYPE_LIST:
+                return listener.new_property(name, typ,
+                                        _convert_TCODList(value.custom, typ & 0xFF))
+            return True
+        clistener.new_struct = _CFUNC_NEW_STRUCT(listener.new_struct)
+        clistener.new_flag = _CFUNC_NEW_FLAG(listener.new_flag)
+        clistener.new_property = _CFUNC_NEW_PROPERTY(value_converter)
+        clistener.end_struct = _CFUNC_NEW_STRUCT(listener.end_struct)
+        clistener.error = _CFUNC_NEW_FLAG(listener.error)
+        _lib.TCOD_parser_run(parser, c_char_p(filename), byref(clistener))
+    else:
+        _lib.TCOD_parser_run(parser, c_char_p(filename), 0)
+
+def parser_delete(parser):
+    _lib.TCOD_parser_delete(parser)
+
+def parser_get_bool_property(parser, name):
+    return _lib.TCOD_parser_get_bool_property(parser, c_char_p(name))
+
+def parser_get_int_property(parser, name):
+    return _lib.TCOD_parser_get_int_property(parser, c_char_p(name))
+
+def parser_get_char_property(parser, name):
+    return '%c' % _lib.TCOD_parser_get_char_property(parser, c_char_p(name))
+
+def parser_get_float_property(parser, name):
+    return _lib.TCOD_parser_get_float_property(parser, c_char_p(name))
+
+def parser_get_string_property(parser, name):
+    return _lib.TCOD_parser_get_string_property(parser, c_char_p(name))
+
+def parser_get_color_property(parser, name):
+    return _lib.TCOD_parser_get_color_property(parser, c_char_p(name))
+
+def parser_get_dice_property(parser, name):
+    d = Dice()
+    _lib.TCOD_parser_get_dice_property_py(c_void_p(parser), c_char_p(name), byref(d))
+    return d
+
+def parser_get_list_property(parser, name, typ):
+    clist = _lib.TCOD_parser_get_list_property(parser, c_char_p(name), c_int(typ))
+    return _convert_TCODList(clist, typ)
@@ -28,6 +28,7 @@
 import sys
 import ctypes
 import struct
+from array import array
 from ctypes import *
 
 if not hasattr(ctypes, "c_bool"):   # for Python < 2.6
@@ -39,6 +40,27 @@ try:  #import NumPy if available
 except ImportError:
     numpy_available = False
 
+def _numpy_values(values):
+    # flat numpy array over a sequence, reading bytes-like objects as one
+    # value per byte rather than as a single string
+    if isinstance(values, (bytes, bytearray)):
+        return numpy.frombuffer(values, dtype=numpy.uint8)
+    return numpy.asarray(values).ravel()
+
+def _c_ints(values):
+    # values as an int* for the C functions, together with the object
+    # owning the memory. array('i') and C int numpy arrays are passed as
+    # they are; anything else is converted.
+    if isinstance(values, array) and values.typecode == 'i':
+        return _int_pointer(values), values
+    if numpy_available:
+        values = numpy.ascontiguousarray(_numpy_values(values), dtype=numpy.intc)
+        return values.ctypes.data_as(POINTER(c_int)), values
+    if isinstance(values, (bytes, memoryview)):
+        values = bytearray(values)
+    values = (c_int * len(values))(*values)
+    return values, values
+
 LINUX=False
 MAC=False
 MINGW=False
@@ -88,8 +110,19 @@ class Color(Structure):
                 ('b', c_uint8),
                 ]
 
+    # comparing in Python is three times faster than TCOD_color_equals.
+    # The arithmetic stays in C: building the result Color costs more in
+    # Python than the call does. Use the color_*_array functions for many
+    # colors at once.
     def __eq__(self, c):
-        return _lib.TCOD_color_equals(self, c)
+        if not isinstance(c, Color):
+            return NotImplemented
+        return self.r == c.r and self.g == c.g and self.b == c.b
+
+    def __ne__(self, c):
+        if not isinstance(c, Color):
+            return NotImplemented
+        return not self == c
 
     def __mul__(self, c):
         if isinstance(c,Color):
@@ -123,10 +156,10 @@ class Color(Structure):
         yield self.g
         yield self.b
 
-# Should be valid on any platform, check it!  Has to be done after Color is defined.
-if MAC:
-    from cprotos import setup_protos
-    setup_protos(_lib)
+# argument and return types of the console, fov, path and random functions,
+# on every platform. Has to be done after Color is defined.
+from cprotos import setup_protos
+setup_protos(_lib)
 
 _lib.TCOD_color_equals.restype = c_bool
 _lib.TCOD_color_multiply.restype = Color
@@ -356,11 +389,96 @@ silver=Color(203,203,203)
 celadon=Color(172,255,175)
 peach=Color(255,159,127)
 
+# the values of the named colors above are interned: color_intern hands
+# out one shared Color per value instead of new equal Colors. The shared
+# colors are copies, so the named ones (grey and gray included) stay
+# separate objects that can be modified on their own.
+_color_table = {}
+for _value in list(globals().values()):
+    if isinstance(_value, Color):
+        _color_table.setdefault((_value.r, _value.g, _value.b), Color(_value.r, _value.g, _value.b))
+del _value
+
+def color_intern(r, g, b):
+    # the named color (r, g, b) if there is one, else a new Color. Interned
+    # colors are shared: do not modify them.
+    c = _color_table.get((r, g, b))
+    if c is None:
+        c = Color(r, g, b)
+    return c
+
 # color functions
 _lib.TCOD_color_lerp.restype = Color
 def color_lerp(c1, c2, a):
     return _lib.TCOD_color_lerp(c1, c2, c_float(a))
 
+# batch color operations. Arrays of colors are anything holding r, g, b
+# values per color: a (..., 3) numpy array, a list of Colors, or packed
+# bytes. With NumPy the whole array is computed at once, in float32 like
+# libtcod, and the result is a uint8 array of shape (..., 3). Without NumPy
+# each color goes through libtcod and the result is a bytearray of packed
+# r, g, b. Both can be passed straight to console_fill_foreground/background.
+def _color_array(colors):
+    if isinstance(colors, Color):
+        return numpy.array(tuple(colors), dtype=numpy.float32)
+    if isinstance(colors, (bytes, bytearray, memoryview)):
+        return numpy.frombuffer(colors, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.float32)
+    if isinstance(colors, (list, tuple)) and colors and isinstance(colors[0], Color):
+        colors = [tuple(c) for c in colors]
+    return numpy.asarray(colors, dtype=numpy.float32)
+
+def _color_list(colors):
+    if isinstance(colors, Color):
+        return [colors]
+    if isinstance(colors, (bytes, bytearray, memoryview)):
+        values = bytearray(colors)
+        return [Color(values[i], values[i + 1], values[i + 2]) for i in range(0, len(values), 3)]
+    return [c if isinstance(c, Color) else Color(*c) for c in colors]
+
+def _color_bytes(colors):
+    # packed r, g, b of a sequence of Colors, copied as one block of memory
+    colors = list(colors)
+    return bytearray((Color * len(colors))(*colors))
+
+def color_lerp_array(c1, c2, a):
+    # color_lerp for many colors at once: c1 and c2 are colors or arrays of
+    # colors and a a coefficient or an array of one coefficient per color
+    if numpy_available:
+        v1 = _color_array(c1)
+        v2 = _color_array(c2)
+        a = numpy.asarray(a, dtype=numpy.float32)
+        if a.ndim:
+            a = a[..., numpy.newaxis]
+        return numpy.clip(v1 + (v2 - v1) * a, 0, 255).astype(numpy.uint8)
+    c1 = _color_list(c1)
+    c2 = _color_list(c2)
+    count = max(len(c1), len(c2))
+    if isinstance(a, (list, tuple)):
+        count = max(count, len(a))
+    else:
+        a = [a] * count
+    c1 = c1 * (count // len(c1))
+    c2 = c2 * (count // len(c2))
+    lerp = _lib.TCOD_color_lerp
+    return _color_bytes([lerp(x, y, c_float(k)) for (x, y, k) in zip(c1, c2, a)])
+
+def color_scale_array(colors, scale):
+    # colors * scale for an array of colors, like Color * float
+    if numpy_available:
+        values = _color_array(colors) * numpy.float32(scale)
+        return numpy.clip(numpy.trunc(values), 0, 255).astype(numpy.uint8)
+    return _color_bytes(c * scale for c in _color_list(colors))
+
+def color_multiply_array(colors, c):
+    # colors * c for an array of colors and a color (or an array of colors
+    # of the same size), like Color * Color
+    if numpy_available:
+        return (_color_array(colors) * _color_array(c) // 255).astype(numpy.uint8)
+    colors = _color_list(colors)
+    other = _color_list(c)
+    other = other * (len(colors) // len(other))
+    return _color_bytes(a * b for (a, b) in zip(colors, other))
+
 def color_set_hsv(c, h, s, v):
     _lib.TCOD_color_set_HSV(byref(c), c_float(h), c_float(s), c_float(v))
 
@@ -381,6 +499,23 @@ def color_gen_map(colors, indexes):
     _lib.TCOD_color_gen_map(cres, len(colors), ccolors, cindexes)
     return cres
 
+def color_gen_map_array(colors, indexes):
+    # color_gen_map as an array of colors (see color_lerp_array): the
+    # gradient going through colors[i] at indexes[i]
+    if numpy_available:
+        result = numpy.zeros((max(indexes) + 1, 3), dtype=numpy.uint8)
+    else:
+        result = bytearray(3 * (max(indexes) + 1))
+    for i in range(len(colors) - 1):
+        (start, end) = (indexes[i], indexes[i + 1])
+        coefs = [float(j) / (end - start) for j in range(end - start + 1)]
+        segment = color_lerp_array(colors[i], colors[i + 1], coefs)
+        if numpy_available:
+            result[start:end + 1] = segment
+        else:
+            result[3 * start:3 * (end + 1)] = segment
+    return result
+
 ############################
 # console module
 ############################
@@ -473,15 +608,74 @@ class ConsoleBuffer:
             _lib.TCOD_console_fill_foreground(dest, (c_int * len(self.fore_r))(*self.fore_r), (c_int * len(self.fore_g))(*self.fore_g), (c_int * len(self.fore_b))(*self.fore_b))
             _lib.TCOD_console_fill_char(dest, (c_int * len(self.char))(*self.char))
 
-_lib.TCOD_console_credits_render.restype = c_bool
-_lib.TCOD_console_is_fullscreen.restype = c_bool
-_lib.TCOD_console_is_window_closed.restype = c_bool
-_lib.TCOD_console_get_default_background.restype = Color
-_lib.TCOD_console_get_default_foreground.restype = Color
-_lib.TCOD_console_get_char_background.restype = Color
-_lib.TCOD_console_get_char_foreground.restype = Color
-_lib.TCOD_console_get_fading_color.restype = Color
-_lib.TCOD_console_is_key_pressed.restype = c_bool
+class ArrayConsoleBuffer(ConsoleBuffer):
+    # ConsoleBuffer keeping each channel in a contiguous array.array of C
+    # ints. blit hands that memory straight to the fill functions instead of
+    # building new ctypes arrays, and channels take slice assignment
+    # (buf.back_r[i:j] = array('i', ...)). fill_rect fills a rectangle one
+    # row slice at a time, and with NumPy grid() returns a (height, width)
+    # view of a channel for vectorized drawing.
+    _channels = ('back_r', 'back_g', 'back_b', 'fore_r', 'fore_g', 'fore_b', 'char')
+
+    def clear(self, back_r=0, back_g=0, back_b=0, fore_r=0, fore_g=0, fore_b=0, char=' '):
+        # clears the console. Views returned by grid() keep pointing at the
+        # old channels.
+        n = self.width * self.height
+        self.back_r = array('i', [back_r]) * n
+        self.back_g = array('i', [back_g]) * n
+        self.back_b = array('i', [back_b]) * n
+        self.fore_r = array('i', [fore_r]) * n
+        self.fore_g = array('i', [fore_g]) * n
+        self.fore_b = array('i', [fore_b]) * n
+        self.char = array('i', [ord(char)]) * n
+
+    def copy(self):
+        other = ArrayConsoleBuffer(0, 0)
+        other.width = self.width
+        other.height = self.height
+        for name in self._channels:
+            setattr(other, name, array('i', getattr(self, name)))
+        return other
+
+    def grid(self, channel):
+        # (height, width) numpy view sharing memory with the channel of that
+        # name, e.g. buf.grid('back_r')[y1:y2, x1:x2] = 255
+        return numpy.frombuffer(getattr(self, channel), dtype=numpy.intc).reshape(self.height, self.width)
+
+    def fill_rect(self, x, y, w, h, back=None, fore=None, char=None):
+        # set the (r, g, b) background, (r, g, b) foreground and/or character
+        # of every cell of a rectangle
+        values = []
+        if back is not None:
+            values += zip(self._channels[0:3], back)
+        if fore is not None:
+            values += zip(self._channels[3:6], fore)
+        if char is not None:
+            values.append(('char', ord(char)))
+        for (name, value) in values:
+            channel = getattr(self, name)
+            run = array('i', [value]) * w
+            for row in range(y, y + h):
+                start = row * self.width + x
+                channel[start:start + w] = run
+
+    def blit(self, dest, fill_fore=True, fill_back=True):
+        # write the buffer to a console without copying it
+        if (console_get_width(dest) != self.width or
+            console_get_height(dest) != self.height):
+            raise ValueError('ArrayConsoleBuffer.blit: Destination console has an incorrect size.')
+
+        if fill_back:
+            _lib.TCOD_console_fill_background(dest, _int_pointer(self.back_r), _int_pointer(self.back_g), _int_pointer(self.back_b))
+
+        if fill_fore:
+            _lib.TCOD_console_fill_foreground(dest, _int_pointer(self.fore_r), _int_pointer(self.fore_g), _int_pointer(self.fore_b))
+            _lib.TCOD_console_fill_char(dest, _int_pointer(self.char))
+
+def _int_pointer(values):
+    # pointer to the first item of an array('i'), for C functions taking int*
+    return cast(c_void_p(values.buffer_info()[0]), POINTER(c_int))
+
 
 # background rendering modes
 BKGND_NONE = 0
@@ -692,7 +886,8 @@ RIGHT=1
 CENTER=2
 # initializing the console
 def console_init_root(w, h, title, fullscreen=False, renderer=RENDERER_SDL):
-    _lib.TCOD_console_init_root(w, h, c_char_p(title), fullscreen, renderer)
+    del _font_codes[:]
+    _lib.TCOD_console_init_root(w, h, title, fullscreen, renderer)
 
 def console_get_width(con):
     return _lib.TCOD_console_get_width(con)
@@ -701,9 +896,11 @@ def console_get_height(con):
     return _lib.TCOD_console_get_height(con)
 
 def console_set_custom_font(fontFile, flags=FONT_LAYOUT_ASCII_INCOL, nb_char_horiz=0, nb_char_vertic=0):
-    _lib.TCOD_console_set_custom_font(c_char_p(fontFile), flags, nb_char_horiz, nb_char_vertic)
+    del _font_codes[:]
+    _lib.TCOD_console_set_custom_font(fontFile, flags, nb_char_horiz, nb_char_vertic)
 
 def console_map_ascii_code_to_font(asciiCode, fontCharX, fontCharY):
+    del _font_codes[:]
     if type(asciiCode) == str or type(asciiCode) == bytes:
         _lib.TCOD_console_map_ascii_code_to_font(ord(asciiCode), fontCharX,
                                                  fontCharY)
@@ -713,6 +910,7 @@ def console_map_ascii_code_to_font(asciiCode, fontCharX, fontCharY):
 
 def console_map_ascii_codes_to_font(firstAsciiCode, nbCodes, fontCharX,
                                     fontCharY):
+    del _font_codes[:]
     if type(firstAsciiCode) == str or type(asciiCode) == bytes:
         _lib.TCOD_console_map_ascii_codes_to_font(ord(firstAsciiCode), nbCodes,
                                                   fontCharX, fontCharY)
@@ -721,6 +919,7 @@ def console_map_ascii_codes_to_font(firstAsciiCode, nbCodes, fontCharX,
                                                   fontCharX, fontCharY)
 
 def console_map_string_to_font(s, fontCharX, fontCharY):
+    del _font_codes[:]
     if type(s) == bytes:
         _lib.TCOD_console_map_string_to_font(s, fontCharX, fontCharY)
     else:
@@ -730,13 +929,13 @@ def console_is_fullscreen():
     return _lib.TCOD_console_is_fullscreen()
 
 def console_set_fullscreen(fullscreen):
-    _lib.TCOD_console_set_fullscreen(c_int(fullscreen))
+    _lib.TCOD_console_set_fullscreen(fullscreen)
 
 def console_is_window_closed():
     return _lib.TCOD_console_is_window_closed()
 
 def console_set_window_title(title):
-    _lib.TCOD_console_set_window_title(c_char_p(title))
+    _lib.TCOD_console_set_window_title(title)
 
 def console_credits():
     _lib.TCOD_console_credits()
@@ -745,7 +944,7 @@ def console_credits_reset():
     _lib.TCOD_console_credits_reset()
 
 def console_credits_render(x, y, alpha):
-    return _lib.TCOD_console_credits_render(x, y, c_int(alpha))
+    return _lib.TCOD_console_credits_render(x, y, alpha)
 
 def console_flush():
     _lib.TCOD_console_flush()
@@ -785,49 +984,49 @@ def console_set_char(con, x, y, c):
         _lib.TCOD_console_set_char(con, x, y, c)
 
 def console_set_background_flag(con, flag):
-    _lib.TCOD_console_set_background_flag(con, c_int(flag))
+    _lib.TCOD_console_set_background_flag(con, flag)
 
 def console_get_background_flag(con):
     return _lib.TCOD_console_get_background_flag(con)
 
 def console_set_alignment(con, alignment):
-    _lib.TCOD_console_set_alignment(con, c_int(alignment))
+    _lib.TCOD_console_set_alignment(con, alignment)
 
 def console_get_alignment(con):
     return _lib.TCOD_console_get_alignment(con)
 
 def console_print(con, x, y, fmt):
     if type(fmt) == bytes:
-        _lib.TCOD_console_print(c_void_p(con), x, y, c_char_p(fmt))
+        _lib.TCOD_console_print(con, x, y, fmt)
     else:
-        _lib.TCOD_console_print_utf(c_void_p(con), x, y, fmt)
+        _lib.TCOD_console_print_utf(con, x, y, fmt)
 
 def console_print_ex(con, x, y, flag, alignment, fmt):
     if type(fmt) == bytes:
-        _lib.TCOD_console_print_ex(c_void_p(con), x, y, flag, alignment, c_char_p(fmt))
+        _lib.TCOD_console_print_ex(con, x, y, flag, alignment, fmt)
     else:
-        _lib.TCOD_console_print_ex_utf(c_void_p(con), x, y, flag, alignment, fmt)
+        _lib.TCOD_console_print_ex_utf(con, x, y, flag, alignment, fmt)
 
 def console_print_rect(con, x, y, w, h, fmt):
     if type(fmt) == bytes:
-        return _lib.TCOD_console_print_rect(c_void_p(con), x, y, w, h, c_char_p(fmt))
+        return _lib.TCOD_console_print_rect(con, x, y, w, h, fmt)
     else:
-        return _lib.TCOD_console_print_rect_utf(c_void_p(con), x, y, w, h, fmt)
+        return _lib.TCOD_console_print_rect_utf(con, x, y, w, h, fmt)
 
 def console_print_rect_ex(con, x, y, w, h, flag, alignment, fmt):
     if type(fmt) == bytes:
-        return _lib.TCOD_console_print_rect_ex(c_void_p(con), x, y, w, h, flag, alignment, c_char_p(fmt))
+        return _lib.TCOD_console_print_rect_ex(con, x, y, w, h, flag, alignment, fmt)
     else:
-        return _lib.TCOD_console_print_rect_ex_utf(c_void_p(con), x, y, w, h, flag, alignment, fmt)
+        return _lib.TCOD_console_print_rect_ex_utf(con, x, y, w, h, flag, alignment, fmt)
 
 def console_get_height_rect(con, x, y, w, h, fmt):
     if type(fmt) == bytes:
-        return _lib.TCOD_console_get_height_rect(c_void_p(con), x, y, w, h, c_char_p(fmt))
+        return _lib.TCOD_console_get_height_rect(con, x, y, w, h, fmt)
     else:
-        return _lib.TCOD_console_get_height_rect_utf(c_void_p(con), x, y, w, h, fmt)
+        return _lib.TCOD_console_get_height_rect_utf(con, x, y, w, h, fmt)
 
 def console_rect(con, x, y, w, h, clr, flag=BKGND_DEFAULT):
-    _lib.TCOD_console_rect(con, x, y, w, h, c_int(clr), flag)
+    _lib.TCOD_console_rect(con, x, y, w, h, clr, flag)
 
 def console_hline(con, x, y, l, flag=BKGND_DEFAULT):
     _lib.TCOD_console_hline( con, x, y, l, flag)
@@ -836,7 +1035,7 @@ def console_vline(con, x, y, l, flag=BKGND_DEFAULT):
     _lib.TCOD_console_vline( con, x, y, l, flag)
 
 def console_print_frame(con, x, y, w, h, clear=True, flag=BKGND_DEFAULT, fmt=0):
-    _lib.TCOD_console_print_frame(c_void_p(con), x, y, w, h, c_int(clear), flag, c_char_p(fmt))
+    _lib.TCOD_console_print_frame(con, x, y, w, h, clear, flag, fmt or None)
 
 def console_set_color_control(con,fore,back) :
     _lib.TCOD_console_set_color_control(con,fore,back)
@@ -861,7 +1060,7 @@ def console_set_fade(fade, fadingColor):
     ##_lib.TCOD_console_set_fade_wrapper(fade, fadingColor)
 
 def console_get_fade():
-    return _lib.TCOD_console_get_fade().value
+    return _lib.TCOD_console_get_fade()
 
 def console_get_fading_color():
     return _lib.TCOD_console_get_fading_color()
@@ -869,12 +1068,12 @@ def console_get_fading_color():
 # handling keyboard input
 def console_wait_for_keypress(flush):
     k=Key()
-    _lib.TCOD_console_wait_for_keypress_wrapper(byref(k),c_bool(flush))
+    _lib.TCOD_console_wait_for_keypress_wrapper(byref(k),flush)
     return k
 
 def console_check_for_keypress(flags=KEY_RELEASED):
     k=Key()
-    _lib.TCOD_console_check_for_keypress_wrapper(byref(k),c_int(flags))
+    _lib.TCOD_console_check_for_keypress_wrapper(byref(k),flags)
     return k
 
 def console_is_key_pressed(key):
@@ -898,7 +1097,7 @@ def console_get_height(con):
     return _lib.TCOD_console_get_height(con)
 
 def console_blit(src, x, y, w, h, dst, xdst, ydst, ffade=1.0,bfade=1.0):
-    _lib.TCOD_console_blit(src, x, y, w, h, dst, xdst, ydst, c_float(ffade), c_float(bfade))
+    _lib.TCOD_console_blit(src, x, y, w, h, dst, xdst, ydst, ffade, bfade)
 
 def console_set_key_color(con, col):
     _lib.TCOD_console_set_key_color(con, col)
@@ -907,58 +1106,147 @@ def console_delete(con):
     _lib.TCOD_console_delete(con)
 
 # fast color filling
-def console_fill_foreground(con,r,g,b) :
-    if len(r) != len(g) or len(r) != len(b):
-        raise TypeError('R, G and B must all have the same size.')
-
-    if (numpy_available and isinstance(r, numpy.ndarray) and
-        isinstance(g, numpy.ndarray) and isinstance(b, numpy.ndarray)):
-        #numpy arrays, use numpy's ctypes functions
-        r = numpy.ascontiguousarray(r, dtype=numpy.int_)
-        g = numpy.ascontiguousarray(g, dtype=numpy.int_)
-        b = numpy.ascontiguousarray(b, dtype=numpy.int_)
-        cr = r.ctypes.data_as(POINTER(c_int))
-        cg = g.ctypes.data_as(POINTER(c_int))
-        cb = b.ctypes.data_as(POINTER(c_int))
-    else:
-        # otherwise convert using ctypes arrays
-        cr = (c_int * len(r))(*r)
-        cg = (c_int * len(g))(*g)
-        cb = (c_int * len(b))(*b)
-
-    _lib.TCOD_console_fill_foreground(con, cr, cg, cb)
+# layout of a TCOD console, used to write colors straight into its cells.
+# Each cell is 16 bytes: the character and its position in the font (ints),
+# then the foreground and background colors (3 bytes each).
+class _CConsole(Structure):
+    _fields_=[('buf', c_void_p),
+              ('oldbuf', c_void_p),
+              ('w', c_int),
+              ('h', c_int),
+              ]
 
-def console_fill_background(con,r,g,b) :
-    if len(r) != len(g) or len(r) != len(b):
+_CONSOLE_CELL_SIZE = 16
+_CONSOLE_FORE = 8
+_CONSOLE_BACK = 11
+
+def _console_fill_color(con, offset, fill, r, g, b):
+    # Shared by console_fill_foreground and console_fill_background.
+    # Colors come either as three channels r, g, b or packed in r alone as
+    # r, g, b bytes per cell (e.g. a (height, width, 3) uint8 array), and
+    # may be any sequence or buffer: numpy arrays, array.array, bytes,
+    # memoryviews. C int channels are handed to the C function fill as they
+    # are. With NumPy anything else is written straight into the cells of
+    # an offscreen console at offset, converting on the fly, so nothing is
+    # copied on the Python side.
+    if numpy_available:
+        if g is None and b is None:
+            rgb = _numpy_values(r)
+            if len(rgb) % 3:
+                raise TypeError('Packed colors must have 3 values per cell.')
+            channels = (rgb[0::3], rgb[1::3], rgb[2::3])
+        else:
+            channels = (_numpy_values(r), _numpy_values(g), _numpy_values(b))
+        if len(channels[0]) != len(channels[1]) or len(channels[0]) != len(channels[2]):
+            raise TypeError('R, G and B must all have the same size.')
+
+        if con and not all(c.dtype == numpy.intc and c.flags.c_contiguous for c in channels):
+            data = _CConsole.from_address(con)
+            n = data.w * data.h
+            if len(channels[0]) != n:
+                raise TypeError('Colors must have one value per console cell.')
+            cells = numpy.ctypeslib.as_array(cast(data.buf, POINTER(c_uint8)), (n, _CONSOLE_CELL_SIZE))
+            for i in range(3):
+                cells[:, offset + i] = channels[i]
+            return
+        (r, g, b) = channels
+    elif g is None and b is None:
+        packed = bytearray(r)
+        if len(packed) % 3:
+            raise TypeError('Packed colors must have 3 values per cell.')
+        (r, g, b) = (packed[0::3], packed[1::3], packed[2::3])
+    elif len(r) != len(g) or len(r) != len(b):
         raise TypeError('R, G and B must all have the same size.')
 
-    if (numpy_available and isinstance(r, numpy.ndarray) and
-        isinstance(g, numpy.ndarray) and isinstance(b, numpy.ndarray)):
-        #numpy arrays, use numpy's ctypes functions
-        r = numpy.ascontiguousarray(r, dtype=numpy.int_)
-        g = numpy.ascontiguousarray(g, dtype=numpy.int_)
-        b = numpy.ascontiguousarray(b, dtype=numpy.int_)
-        cr = r.ctypes.data_as(POINTER(c_int))
-        cg = g.ctypes.data_as(POINTER(c_int))
-        cb = b.ctypes.data_as(POINTER(c_int))
-    else:
-        # otherwise convert using ctypes arrays
-        cr = (c_int * len(r))(*r)
-        cg = (c_int * len(g))(*g)
-        cb = (c_int * len(b))(*b)
+    (cr, r) = _c_ints(r)
+    (cg, g) = _c_ints(g)
+    (cb, b) = _c_ints(b)
+    fill(con, cr, cg, cb)
 
-    _lib.TCOD_console_fill_background(con, cr, cg, cb)
+def console_fill_foreground(con, r, g=None, b=None) :
+    _console_fill_color(con, _CONSOLE_FORE, _lib.TCOD_console_fill_foreground, r, g, b)
 
-def console_fill_char(con,arr) :
-    if (numpy_available and isinstance(arr, numpy.ndarray) ):
-        #numpy arrays, use numpy's ctypes functions
-        arr = numpy.ascontiguousarray(arr, dtype=numpy.int_)
-        carr = arr.ctypes.data_as(POINTER(c_int))
-    else:
-        #otherwise convert using the struct module
-        carr = struct.pack('%di' % len(arr), *arr)
+def console_fill_background(con, r, g=None, b=None) :
+    _console_fill_color(con, _CONSOLE_BACK, _lib.TCOD_console_fill_background, r, g, b)
 
+def console_fill_char(con,arr) :
+    # arr holds one character code per cell: any sequence of ints or buffer
+    # (bytes hold one character per byte)
+    (carr, arr) = _c_ints(arr)
     _lib.TCOD_console_fill_char(con, carr)
+
+# batched drawing
+# Next to its character every cell keeps the character's position in the
+# font. _font_codes holds that position for the codes 0-255, read once from
+# a scratch console filled with every code; changing the font or its
+# mapping empties it.
+_font_codes = array('i')
+
+def _console_font_codes():
+    if not _font_codes:
+        scratch = _lib.TCOD_console_new(256, 1)
+        _lib.TCOD_console_fill_char(scratch, (c_int * 256)(*range(256)))
+        cells = string_at(_CConsole.from_address(scratch).buf, 256 * _CONSOLE_CELL_SIZE)
+        _font_codes.extend(struct.unpack_from('<i', cells, i * _CONSOLE_CELL_SIZE + 4)[0] for i in range(256))
+        _lib.TCOD_console_delete(scratch)
+    return _font_codes
+
+def console_draw_batch(con, records):
+    # draw a whole sequence of (x, y, char, fore, back) records at once.
+    # char is a character code or a string, drawn left to right from x
+    # (without color control codes or line breaks); fore and back are
+    # Colors. A None char, fore or back leaves that part of the cells as
+    # it is, like console_put_char with BKGND_NONE. Cells outside the
+    # console are skipped.
+    # The records are written straight into the cells of an offscreen
+    # console, so drawing costs no call to libtcod however many there are.
+    # The root console is drawn one cell at a time.
+    if not con:
+        _console_draw_calls(con, records)
+        return
+    data = _CConsole.from_address(con)
+    (w, h) = (data.w, data.h)
+    cells = (c_uint8 * (w * h * _CONSOLE_CELL_SIZE)).from_address(data.buf)
+    codes = _console_font_codes()
+    pack_into = struct.pack_into
+    for (x, y, char, fore, back) in records:
+        if not 0 <= y < h:
+            continue
+        if char is None or isinstance(char, int):
+            chars = (char,)
+        elif len(char) == 1:
+            chars = (ord(char),)
+        else:
+            chars = bytearray(char) if isinstance(char, bytes) else [ord(c) for c in char]
+        for c in chars:
+            if 0 <= x < w:
+                offset = (y * w + x) * _CONSOLE_CELL_SIZE
+                if c is not None:
+                    if c < 256:
+                        pack_into('<ii', cells, offset, c, codes[c])
+                    else:
+                        _lib.TCOD_console_set_char(con, x, y, c)
+                if fore is not None:
+                    pack_into('3B', cells, offset + _CONSOLE_FORE, fore.r, fore.g, fore.b)
+                if back is not None:
+                    pack_into('3B', cells, offset + _CONSOLE_BACK, back.r, back.g, back.b)
+            x += 1
+
+def _console_draw_calls(con, records):
+    # console_draw_batch with a call per cell
+    for (x, y, char, fore, back) in records:
+        if char is None or isinstance(char, int) or len(char) == 1:
+            chars = (char,)
+        else:
+            chars = char
+        for c in chars:
+            if c is not None:
+                console_set_char(con, x, y, c)
+            if fore is not None:
+                _lib.TCOD_console_set_char_foreground(con, x, y, fore)
+            if back is not None:
+                _lib.TCOD_console_set_char_background(con, x, y, back, BKGND_SET)
+            x += 1
         
 def console_load_asc(con, filename) :
     _lib.TCOD_console_load_asc(con,filename)
@@ -1120,10 +1408,10 @@ def image_load(filename):
     return _lib.TCOD_image_load(c_char_p(filename))
 
 def image_from_console(console):
-    return _lib.TCOD_image_from_console(console)
+    return _lib.TCOD_image_from_console(c_void_p(console))
 
 def image_refresh_console(image, console):
-    _lib.TCOD_image_refresh_console(image, console)
+    _lib.TCOD_image_refresh_console(image, c_void_p(console))
 
 def image_get_size(image):
     w=c_int()
@@ -1195,204 +1483,9 @@ def mouse_get_status():
     _lib.TCOD_mouse_get_status_wrapper(byref(mouse))
     return mouse
 
-############################
-# parser module
-############################
-_lib.TCOD_struct_get_name.restype = c_char_p
-_lib.TCOD_struct_is_mandatory.restype = c_bool
-_lib.TCOD_parser_get_bool_property.restype = c_bool
-_lib.TCOD_parser_get_float_property.restype = c_float
-_lib.TCOD_parser_get_string_property.restype = c_char_p
-_lib.TCOD_parser_get_color_property.restype = Color
-
-class Dice(Structure):
-    _fields_=[('nb_dices', c_int),
-              ('nb_faces', c_int),
-              ('multiplier', c_float),
-              ('addsub', c_float),
-              ]
-
-    def __repr__(self):
-        return "Dice(%d, %d, %s, %s)" % (self.nb_dices, self.nb_faces,
-                                      self.multiplier, self.addsub)
-
-class _CValue(Union):
-    _fields_=[('c',c_uint8),
-              ('i',c_int),
-              ('f',c_float),
-              ('s',c_char_p),
-              # JBR03192012 See http://bugs.python.org/issue14354 for why these are not defined as their actual types
-              ('col',c_uint8 * 3),
-              ('dice',c_int * 4),
-              ('custom',c_void_p),
-              ]
-
-_CFUNC_NEW_STRUCT = CFUNCTYPE(c_uint, c_void_p, c_char_p)
-_CFUNC_NEW_FLAG = CFUNCTYPE(c_uint, c_char_p)
-_CFUNC_NEW_PROPERTY = CFUNCTYPE(c_uint, c_char_p, c_int, _CValue)
-
-class _CParserListener(Structure):
-    _fields_=[('new_struct', _CFUNC_NEW_STRUCT),
-              ('new_flag',_CFUNC_NEW_FLAG),
-              ('new_property',_CFUNC_NEW_PROPERTY),
-              ('end_struct',_CFUNC_NEW_STRUCT),
-              ('error',_CFUNC_NEW_FLAG),
-              ]
-
-# property types
-TYPE_NONE = 0
-TYPE_BOOL = 1
-TYPE_CHAR = 2
-TYPE_INT = 3
-TYPE_FLOAT = 4
-TYPE_STRING = 5
-TYPE_COLOR = 6
-TYPE_DICE = 7
-TYPE_VALUELIST00 = 8
-TYPE_VALUELIST01 = 9
-TYPE_VALUELIST02 = 10
-TYPE_VALUELIST03 = 11
-TYPE_VALUELIST04 = 12
-TYPE_VALUELIST05 = 13
-TYPE_VALUELIST06 = 14
-TYPE_VALUELIST07 = 15
-TYPE_VALUELIST08 = 16
-TYPE_VALUELIST09 = 17
-TYPE_VALUELIST10 = 18
-TYPE_VALUELIST11 = 19
-TYPE_VALUELIST12 = 20
-TYPE_VALUELIST13 = 21
-TYPE_VALUELIST14 = 22
-TYPE_VALUELIST15 = 23
-TYPE_LIST = 1024
-
-def _convert_TCODList(clist, typ):
-    res = list()
-    for i in range(_lib.TCOD_list_size(clist)):
-        elt = _lib.TCOD_list_get(clist, i)
-        elt = cast(elt, c_void_p)
-        if typ == TYPE_BOOL:
-            elt = c_bool.from_buffer(elt).value
-        elif typ == TYPE_CHAR:
-            elt = c_char.from_buffer(elt).value
-        elif typ == TYPE_INT:
-            elt = c_int.from_buffer(elt).value
-        elif typ == TYPE_FLOAT:
-            elt = c_float.from_buffer(elt).value
-        elif typ == TYPE_STRING or TYPE_VALUELIST15 >= typ >= TYPE_VALUELIST00:
-            elt = cast(elt, c_char_p).value
-        elif typ == TYPE_COLOR:
-            elt = Color.from_buffer_copy(elt)
-        elif typ == TYPE_DICE:
-            # doesn't work
-            elt = Dice.from_buffer_copy(elt)
-        res.append(elt)
-    return res
-
-def parser_new():
-    return _lib.TCOD_parser_new()
-
-def parser_new_struct(parser, name):
-    return _lib.TCOD_parser_new_struct(parser, name)
-
-def struct_add_flag(struct, name):
-    _lib.TCOD_struct_add_flag(struct, name)
-
-def struct_add_property(struct, name, typ, mandatory):
-    _lib.TCOD_struct_add_property(struct, name, typ, c_bool(mandatory))
-
-def struct_add_value_list(struct, name, value_list, mandatory):
-    CARRAY = c_char_p * (len(value_list) + 1)
-    cvalue_list = CARRAY()
-    for i in range(len(value_list)):
-        cvalue_list[i] = cast(value_list[i], c_char_p)
-    cvalue_list[len(value_list)] = 0
-    _lib.TCOD_struct_add_value_list(struct, name, cvalue_list, c_bool(mandatory))
-
-def struct_add_list_property(struct, name, typ, mandatory):
-    _lib.TCOD_struct_add_list_property(struct, name, typ, c_bool(mandatory))
-
-def struct_add_structure(struct, sub_struct):
-    _lib.TCOD_struct_add_structure(struct, sub_struct)
-
-def struct_get_name(struct):
-    return _lib.TCOD_struct_get_name(struct)
-
-def struct_is_mandatory(struct, name):
-    return _lib.TCOD_struct_is_mandatory(struct, name)
-
-def struct_get_type(struct, name):
-    return _lib.TCOD_struct_get_type(struct, name)
-
-def parser_run(parser, filename, listener=0):
-    if listener != 0:
-        clistener=_CParserListener()
-        def value_converter(name, typ, value):
-            if typ == TYPE_BOOL:
-                return listener.new_property(name, typ, value.c == 1)
-            elif typ == TYPE_CHAR:
-                return listener.new_property(name, typ, '%c' % (value.c & 0xFF))
-            elif typ == TYPE_INT:
-                return listener.new_property(name, typ, value.i)
-            elif typ == TYPE_FLOAT:
-                return listener.new_property(name, typ, value.f)
-            elif typ == TYPE_STRING or \
-                 TYPE_VALUELIST15 >= typ >= TYPE_VALUELIST00:
-                 return listener.new_property(name, typ, value.s)
-            elif typ == TYPE_COLOR:
-                col = cast(value.col, POINTER(Color)).contents
-                return listener.new_property(name, typ, col)
-            elif typ == TYPE_DICE:
-                dice = cast(value.dice, POINTER(Dice)).contents
-                return listener.new_property(name, typ, dice)
-            elif typ & TYPE_LIST:
-                return listener.new_property(name, typ,
-                                        _convert_TCODList(value.custom, typ & 0xFF))
-            return True
-        clistener.new_struct = _CFUNC_NEW_STRUCT(listener.new_struct)
-        clistener.new_flag = _CFUNC_NEW_FLAG(listener.new_flag)
-        clistener.new_property = _CFUNC_NEW_PROPERTY(value_converter)
-        clistener.end_struct = _CFUNC_NEW_STRUCT(listener.end_struct)
-        clistener.error = _CFUNC_NEW_FLAG(listener.error)
-        _lib.TCOD_parser_run(parser, c_char_p(filename), byref(clistener))
-    else:
-        _lib.TCOD_parser_run(parser, c_char_p(filename), 0)
-
-def parser_delete(parser):
-    _lib.TCOD_parser_delete(parser)
-
-def parser_get_bool_property(parser, name):
-    return _lib.TCOD_parser_get_bool_property(parser, c_char_p(name))
-
-def parser_get_int_property(parser, name):
-    return _lib.TCOD_parser_get_int_property(parser, c_char_p(name))
-
-def parser_get_char_property(parser, name):
-    return '%c' % _lib.TCOD_parser_get_char_property(parser, c_char_p(name))
-
-def parser_get_float_property(parser, name):
-    return _lib.TCOD_parser_get_float_property(parser, c_char_p(name))
-
-def parser_get_string_property(parser, name):
-    return _lib.TCOD_parser_get_string_property(parser, c_char_p(name))
-
-def parser_get_color_property(parser, name):
-    return _lib.TCOD_parser_get_color_property(parser, c_char_p(name))
-
-def parser_get_dice_property(parser, name):
-    d = Dice()
-    _lib.TCOD_parser_get_dice_property_py(c_void_p(parser), c_char_p(name), byref(d))
-    return d
-
-def parser_get_list_property(parser, name, typ):
-    clist = _lib.TCOD_parser_get_list_property(parser, c_char_p(name), c_int(typ))
-    return _convert_TCODList(clist, typ)
-
 ############################
 # random module
 ############################
-_lib.TCOD_random_get_float.restype = c_float
-_lib.TCOD_random_get_double.restype = c_double
 
 RNG_MT = 0
 RNG_CMWC = 1
@@ -1410,7 +1503,7 @@ def random_new(algo=RNG_CMWC):
     return _lib.TCOD_random_new(algo)
 
 def random_new_from_seed(seed, algo=RNG_CMWC):
-    return _lib.TCOD_random_new_from_seed(algo,c_uint(seed))
+    return _lib.TCOD_random_new_from_seed(algo,seed)
 
 def random_set_distribution(rnd, dist) :
 	_lib.TCOD_random_set_distribution(rnd, dist)
@@ -1419,19 +1512,19 @@ def random_get_int(rnd, mi, ma):
     return _lib.TCOD_random_get_int(rnd, mi, ma)
 
 def random_get_float(rnd, mi, ma):
-    return _lib.TCOD_random_get_float(rnd, c_float(mi), c_float(ma))
+    return _lib.TCOD_random_get_float(rnd, mi, ma)
 
 def random_get_double(rnd, mi, ma):
-    return _lib.TCOD_random_get_double(rnd, c_double(mi), c_double(ma))
+    return _lib.TCOD_random_get_double(rnd, mi, ma)
 
 def random_get_int_mean(rnd, mi, ma, mean):
     return _lib.TCOD_random_get_int_mean(rnd, mi, ma, mean)
 
 def random_get_float_mean(rnd, mi, ma, mean):
-    return _lib.TCOD_random_get_float_mean(rnd, c_float(mi), c_float(ma), c_float(mean))
+    return _lib.TCOD_random_get_float_mean(rnd, mi, ma, mean)
 
 def random_get_double_mean(rnd, mi, ma, mean):
-    return _lib.TCOD_random_get_double_mean(rnd, c_double(mi), c_double(ma), c_double(mean))
+    return _lib.TCOD_random_get_double_mean(rnd, mi, ma, mean)
 
 def random_save(rnd):
     return _lib.TCOD_random_save(rnd)
@@ -1443,54 +1536,23 @@ def random_delete(rnd):
     _lib.TCOD_random_delete(rnd)
 
 ############################
-# noise module
+# fov module
 ############################
-_lib.TCOD_noise_get.restype = c_float
-_lib.TCOD_noise_get_ex.restype = c_float
-_lib.TCOD_noise_get_fbm.restype = c_float
-_lib.TCOD_noise_get_fbm_ex.restype = c_float
-_lib.TCOD_noise_get_turbulence.restype = c_float
-_lib.TCOD_noise_get_turbulence_ex.restype = c_float
-
-NOISE_DEFAULT_HURST = 0.5
-NOISE_DEFAULT_LACUNARITY = 2.0
-
-NOISE_DEFAULT = 0
-NOISE_PERLIN = 1
-NOISE_SIMPLEX = 2
-NOISE_WAVELET = 4
-
-_NOISE_PACKER_FUNC = (None,
-                      (c_float * 1),
-                      (c_float * 2),
-                      (c_float * 3),
-                      (c_float * 4),
-                      )
-
-def noise_new(dim, h=NOISE_DEFAULT_HURST, l=NOISE_DEFAULT_LACUNARITY, random=0):
-    return _lib.TCOD_noise_new(dim, c_float(h), c_float(l), random)
-
-def noise_set_type(n, typ) :
-    _lib.TCOD_noise_set_type(n,typ)
-
-def noise_get(n, f, typ=NOISE_DEFAULT):
-    return _lib.TCOD_noise_get_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), typ)
-
-def noise_get_fbm(n, f, oc, typ=NOISE_DEFAULT):
-    return _lib.TCOD_noise_get_fbm_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), c_float(oc), typ)
 
-def noise_get_turbulence(n, f, oc, typ=NOISE_DEFAULT):
-    return _lib.TCOD_noise_get_turbulence_ex(n, _NOISE_PACKER_FUNC[len(f)](*f), c_float(oc), typ)
+# layout of a TCOD map, used to read the cells without a call per cell.
+# Each cell is one byte of bit flags: transparent, walkable, fov.
+class _CMap(Structure):
+    _fields_=[('width', c_int),
+              ('height', c_int),
+              ('nbcells', c_int),
+              ('cells', POINTER(c_uint8)),
+              ]
 
-def noise_delete(n):
-    _lib.TCOD_noise_delete(n)
+MAP_CELL_TRANSPARENT = 1
+MAP_CELL_WALKABLE = 2
+MAP_CELL_FOV = 4
 
-############################
-# fov module
-############################
-_lib.TCOD_map_is_in_fov.restype = c_bool
-_lib.TCOD_map_is_transparent.restype = c_bool
-_lib.TCOD_map_is_walkable.restype = c_bool
+_MAP_FOV_TABLE = bytes(bytearray([1 if i & MAP_CELL_FOV else 0 for i in range(256)]))
 
 FOV_BASIC = 0
 FOV_DIAMOND = 1
@@ -1517,13 +1579,26 @@ def map_copy(source, dest):
     return _lib.TCOD_map_copy(source, dest)
 
 def map_set_properties(m, x, y, isTrans, isWalk):
-    _lib.TCOD_map_set_properties(m, x, y, c_int(isTrans), c_int(isWalk))
+    _lib.TCOD_map_set_properties(m, x, y, isTrans, isWalk)
 
 def map_clear(m,walkable=False,transparent=False):
-    _lib.TCOD_map_clear(m,c_int(walkable),c_int(transparent))
+    _lib.TCOD_map_clear(m,walkable,transparent)
+
+# the fov flags of the last map_compute_fov on each map, see map_get_fov_snapshot
+_fov_snapshots = {}
 
 def map_compute_fov(m, x, y, radius=0, light_walls=True, algo=FOV_RESTRICTIVE ):
-    _lib.TCOD_map_compute_fov(m, x, y, c_int(radius), c_bool(light_walls), c_int(algo))
+    _lib.TCOD_map_compute_fov(m, x, y, radius, light_walls, algo)
+    cmap = cast(c_void_p(m), POINTER(_CMap)).contents
+    _fov_snapshots[m] = bytearray(string_at(cmap.cells, cmap.nbcells).translate(_MAP_FOV_TABLE))
+
+def map_get_fov_snapshot(m):
+    # the fov flags computed by the last map_compute_fov on m, as a
+    # bytearray holding 0 or 1 per cell row by row (None if it was never computed).
+    # Reading a cell is a plain index, y * width + x, instead of a call to
+    # map_is_in_fov. The snapshot is not updated by later changes to the
+    # map, only replaced by the next map_compute_fov.
+    return _fov_snapshots.get(m)
 
 def map_is_in_fov(m, x, y):
     return _lib.TCOD_map_is_in_fov(m, x, y)
@@ -1534,7 +1609,35 @@ def map_is_transparent(m, x, y):
 def map_is_walkable(m, x, y):
     return _lib.TCOD_map_is_walkable(m, x, y)
 
+def map_load_properties(m, transparent, walkable):
+    # set the transparent and walkable flags of the whole map in one pass.
+    # Both are row by row sequences of width*height values (bytes, lists or
+    # numpy arrays), any non zero value meaning true. The fov flags are
+    # cleared.
+    cmap = cast(c_void_p(m), POINTER(_CMap)).contents
+    if len(transparent) != cmap.nbcells or len(walkable) != cmap.nbcells:
+        raise TypeError('transparent and walkable must have one value per map cell.')
+    if numpy_available:
+        cells = numpy.ctypeslib.as_array(cmap.cells, (cmap.nbcells,))
+        cells[:] = ((_numpy_values(transparent) != 0) * MAP_CELL_TRANSPARENT |
+                    (_numpy_values(walkable) != 0) * MAP_CELL_WALKABLE)
+    else:
+        data = bytes(bytearray([(MAP_CELL_TRANSPARENT if t else 0) | (MAP_CELL_WALKABLE if w else 0)
+                                for t, w in zip(transparent, walkable)]))
+        memmove(cmap.cells, data, cmap.nbcells)
+
+def map_get_fov(m):
+    # read the fov flag of every cell in one go, row by row. Returns a
+    # (height, width) numpy bool array if NumPy is available, otherwise a
+    # bytes object holding 0 or 1 per cell.
+    cmap = cast(c_void_p(m), POINTER(_CMap)).contents
+    if numpy_available:
+        cells = numpy.ctypeslib.as_array(cmap.cells, (cmap.height, cmap.width))
+        return (cells & MAP_CELL_FOV) != 0
+    return string_at(cmap.cells, cmap.nbcells).translate(_MAP_FOV_TABLE)
+
 def map_delete(m):
+    _fov_snapshots.pop(m, None)
     return _lib.TCOD_map_delete(m)
 
 def map_get_width(map):
@@ -1546,19 +1649,16 @@ def map_get_height(map):
 ############################
 # pathfinding module
 ############################
-_lib.TCOD_path_compute.restype = c_bool
-_lib.TCOD_path_is_empty.restype = c_bool
-_lib.TCOD_path_walk.restype = c_bool
 
 PATH_CBK_FUNC = CFUNCTYPE(c_float, c_int, c_int, c_int, c_int, py_object)
 
 def path_new_using_map(m, dcost=1.41):
-    return (_lib.TCOD_path_new_using_map(c_void_p(m), c_float(dcost)), None)
+    return (_lib.TCOD_path_new_using_map(m, dcost), None)
 
 def path_new_using_function(w, h, func, userdata=0, dcost=1.41):
     cbk_func = PATH_CBK_FUNC(func)
     return (_lib.TCOD_path_new_using_function(w, h, cbk_func,
-            py_object(userdata), c_float(dcost)), cbk_func)
+            py_object(userdata), dcost), cbk_func)
 
 def path_compute(p, ox, oy, dx, dy):
     return _lib.TCOD_path_compute(p[0], ox, oy, dx, dy)
@@ -1593,34 +1693,56 @@ def path_is_empty(p):
 def path_walk(p, recompute):
     x = c_int()
     y = c_int()
-    if _lib.TCOD_path_walk(p[0], byref(x), byref(y), c_int(recompute)):
+    if _lib.TCOD_path_walk(p[0], byref(x), byref(y), recompute):
         return x.value, y.value
     return None,None
 
 def path_delete(p):
     _lib.TCOD_path_delete(p[0])
 
-_lib.TCOD_dijkstra_path_set.restype = c_bool
-_lib.TCOD_dijkstra_is_empty.restype = c_bool
-_lib.TCOD_dijkstra_path_walk.restype = c_bool
-_lib.TCOD_dijkstra_get_distance.restype = c_float
+
+# layout of a TCOD dijkstra, used to read the whole distance grid at once.
+# Distances are stored x100 as unsigned ints, row by row.
+class _CDijkstra(Structure):
+    _fields_=[('diagonal_cost', c_int),
+              ('width', c_int),
+              ('height', c_int),
+              ('nodes_max', c_int),
+              ('map', c_void_p),
+              ('func', c_void_p),
+              ('user_data', c_void_p),
+              ('distances', POINTER(c_uint)),
+              ('nodes', POINTER(c_uint)),
+              ('path', c_void_p),
+              ]
+
+# value of dijkstra_get_distances for cells that cannot be reached
+DIJKSTRA_UNREACHABLE = 0xffffffff
 
 def dijkstra_new(m, dcost=1.41):
-    return (_lib.TCOD_dijkstra_new(c_void_p(m), c_float(dcost)), None)
+    return (_lib.TCOD_dijkstra_new(m, dcost), None)
 
 def dijkstra_new_using_function(w, h, func, userdata=0, dcost=1.41):
     cbk_func = PATH_CBK_FUNC(func)
-    return (_lib.TCOD_path_dijkstra_using_function(w, h, cbk_func,
-            py_object(userdata), c_float(dcost)), cbk_func)
+    return (_lib.TCOD_dijkstra_new_using_function(w, h, cbk_func,
+            py_object(userdata), dcost), cbk_func)
 
 def dijkstra_compute(p, ox, oy):
-    _lib.TCOD_dijkstra_compute(p[0], c_int(ox), c_int(oy))
+    _lib.TCOD_dijkstra_compute(p[0], ox, oy)
 
 def dijkstra_path_set(p, x, y):
-    return _lib.TCOD_dijkstra_path_set(p[0], c_int(x), c_int(y))
+    return _lib.TCOD_dijkstra_path_set(p[0], x, y)
 
 def dijkstra_get_distance(p, x, y):
-    return _lib.TCOD_dijkstra_get_distance(p[0], c_int(x), c_int(y))
+    return _lib.TCOD_dijkstra_get_distance(p[0], x, y)
+
+def dijkstra_get_distances(p):
+    # the distance of every cell to the root, x100, as a flat array of
+    # width*height unsigned ints indexed by y*width+x. The array shares the
+    # dijkstra's memory: it is valid until dijkstra_delete and is updated
+    # in place by dijkstra_compute.
+    d = _CDijkstra.from_address(p[0])
+    return (c_uint * (d.width * d.height)).from_address(addressof(d.distances.contents))
 
 def dijkstra_size(p):
     return _lib.TCOD_dijkstra_size(p[0])
@@ -1631,7 +1753,7 @@ def dijkstra_reverse(p):
 def dijkstra_get(p, idx):
     x = c_int()
     y = c_int()
-    _lib.TCOD_dijkstra_get(p[0], c_int(idx), byref(x), byref(y))
+    _lib.TCOD_dijkstra_get(p[0], idx, byref(x), byref(y))
     return x.value, y.value
 
 def dijkstra_is_empty(p):
@@ -1647,311 +1769,55 @@ def dijkstra_path_walk(p):
 def dijkstra_delete(p):
     _lib.TCOD_dijkstra_delete(p[0])
 
-############################
-# bsp module
-############################
-class _CBsp(Structure):
-    _fields_ = [('next', c_void_p),
-                ('father', c_void_p),
-                ('son', c_void_p),
-                ('x', c_int),
-                ('y', c_int),
-                ('w', c_int),
-                ('h', c_int),
-                ('position', c_int),
-                ('level', c_uint8),
-                ('horizontal', c_bool),
-                ]
-
-_lib.TCOD_bsp_new_with_size.restype = POINTER(_CBsp)
-_lib.TCOD_bsp_left.restype = POINTER(_CBsp)
-_lib.TCOD_bsp_right.restype = POINTER(_CBsp)
-_lib.TCOD_bsp_father.restype = POINTER(_CBsp)
-_lib.TCOD_bsp_is_leaf.restype = c_bool
-_lib.TCOD_bsp_contains.restype = c_bool
-_lib.TCOD_bsp_find_node.restype = POINTER(_CBsp)
-
-BSP_CBK_FUNC = CFUNCTYPE(c_int, c_void_p, c_void_p)
-
-# python class encapsulating the _CBsp pointer
-class Bsp(object):
-    def __init__(self, cnode):
-        pcbsp = cast(cnode, POINTER(_CBsp))
-        self.p = pcbsp
-
-    def getx(self):
-        return self.p.contents.x
-    def setx(self, value):
-        self.p.contents.x = value
-    x = property(getx, setx)
-
-    def gety(self):
-        return self.p.contents.y
-    def sety(self, value):
-        self.p.contents.y = value
-    y = property(gety, sety)
-
-    def getw(self):
-        return self.p.contents.w
-    def setw(self, value):
-        self.p.contents.w = value
-    w = property(getw, setw)
-
-    def geth(self):
-        return self.p.contents.h
-    def seth(self, value):
-        self.p.contents.h = value
-    h = property(geth, seth)
-
-    def getpos(self):
-        return self.p.contents.position
-    def setpos(self, value):
-        self.p.contents.position = value
-    position = property(getpos, setpos)
-
-    def gethor(self):
-        return self.p.contents.horizontal
-    def sethor(self,value):
-        self.p.contents.horizontal = value
-    horizontal = property(gethor, sethor)
-
-    def getlev(self):
-        return self.p.contents.level
-    def setlev(self,value):
-        self.p.contents.level = value
-    level = property(getlev, setlev)
-
-
-def bsp_new_with_size(x, y, w, h):
-    return Bsp(_lib.TCOD_bsp_new_with_size(x, y, w, h))
-
-def bsp_split_once(node, horizontal, position):
-    _lib.TCOD_bsp_split_once(node.p, c_int(horizontal), position)
-
-def bsp_split_recursive(node, randomizer, nb, minHSize, minVSize, maxHRatio,
-                        maxVRatio):
-    _lib.TCOD_bsp_split_recursive(node.p, randomizer, nb, minHSize, minVSize,
-                                  c_float(maxHRatio), c_float(maxVRatio))
-
-def bsp_resize(node, x, y, w, h):
-    _lib.TCOD_bsp_resize(node.p, x, y, w, h)
-
-def bsp_left(node):
-    return Bsp(_lib.TCOD_bsp_left(node.p))
-
-def bsp_right(node):
-    return Bsp(_lib.TCOD_bsp_right(node.p))
-
-def bsp_father(node):
-    return Bsp(_lib.TCOD_bsp_father(node.p))
-
-def bsp_is_leaf(node):
-    return _lib.TCOD_bsp_is_leaf(node.p)
-
-def bsp_contains(node, cx, cy):
-    return _lib.TCOD_bsp_contains(node.p, cx, cy)
-
-def bsp_find_node(node, cx, cy):
-    return Bsp(_lib.TCOD_bsp_find_node(node.p, cx, cy))
-
-def _bsp_traverse(node, callback, userData, func):
-    # convert the c node into a python node
-    #before passing it to the actual callback
-    def node_converter(cnode, data):
-        node = Bsp(cnode)
-        return callback(node, data)
-    cbk_func = BSP_CBK_FUNC(node_converter)
-    func(node.p, cbk_func, userData)
-
-def bsp_traverse_pre_order(node, callback, userData=0):
-    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_pre_order)
-
-def bsp_traverse_in_order(node, callback, userData=0):
-    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_in_order)
-
-def bsp_traverse_post_order(node, callback, userData=0):
-    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_post_order)
-
-def bsp_traverse_level_order(node, callback, userData=0):
-    _bsp_traverse(node, callback, userData, _lib.TCOD_bsp_traverse_level_order)
-
-def bsp_traverse_inverted_level_order(node, callback, userData=0):
-    _bsp_traverse(node, callback, userData,
-                  _lib.TCOD_bsp_traverse_inverted_level_order)
-
-def bsp_remove_sons(node):
-    _lib.TCOD_bsp_remove_sons(node.p)
-
-def bsp_delete(node):
-    _lib.TCOD_bsp_delete(node.p)
-
-############################
-# heightmap module
-############################
-class _CHeightMap(Structure):
-    _fields_=[('w', c_int),
-              ('h', c_int),
-              ('values', POINTER(c_float)),
-              ]
-
-_lib.TCOD_heightmap_new.restype = POINTER(_CHeightMap)
-_lib.TCOD_heightmap_get_value.restype = c_float
-_lib.TCOD_heightmap_has_land_on_border.restype = c_bool
-
-class HeightMap(object):
-    def __init__(self, chm):
-        pchm = cast(chm, POINTER(_CHeightMap))
-        self.p = pchm
-
-    def getw(self):
-        return self.p.contents.w
-    def setw(self, value):
-        self.p.contents.w = value
-    w = property(getw, setw)
-
-    def geth(self):
-        return self.p.contents.h
-    def seth(self, value):
-        self.p.contents.h = value
-    h = property(geth, seth)
-
-def heightmap_new(w, h):
-    phm = _lib.TCOD_heightmap_new(w, h)
-    return HeightMap(phm)
-
-def heightmap_set_value(hm, x, y, value):
-    _lib.TCOD_heightmap_set_value(hm.p, x, y, c_float(value))
-
-def heightmap_add(hm, value):
-    _lib.TCOD_heightmap_add(hm.p, c_float(value))
-
-def heightmap_scale(hm, value):
-    _lib.TCOD_heightmap_scale(hm.p, c_float(value))
-
-def heightmap_clear(hm):
-    _lib.TCOD_heightmap_clear(hm.p)
-
-def heightmap_clamp(hm, mi, ma):
-    _lib.TCOD_heightmap_clamp(hm.p, c_float(mi),c_float(ma))
-
-def heightmap_copy(hm1, hm2):
-    _lib.TCOD_heightmap_copy(hm1.p, hm2.p)
-
-def heightmap_normalize(hm,  mi=0.0, ma=1.0):
-    _lib.TCOD_heightmap_normalize(hm.p, c_float(mi), c_float(ma))
-
-def heightmap_lerp_hm(hm1, hm2, hm3, coef):
-    _lib.TCOD_heightmap_lerp_hm(hm1.p, hm2.p, hm3.p, c_float(coef))
-
-def heightmap_add_hm(hm1, hm2, hm3):
-    _lib.TCOD_heightmap_add_hm(hm1.p, hm2.p, hm3.p)
-
-def heightmap_multiply_hm(hm1, hm2, hm3):
-    _lib.TCOD_heightmap_multiply_hm(hm1.p, hm2.p, hm3.p)
-
-def heightmap_add_hill(hm, x, y, radius, height):
-    _lib.TCOD_heightmap_add_hill(hm.p, c_float( x), c_float( y),
-                                 c_float( radius), c_float( height))
-
-def heightmap_dig_hill(hm, x, y, radius, height):
-    _lib.TCOD_heightmap_dig_hill(hm.p, c_float( x), c_float( y),
-                                 c_float( radius), c_float( height))
-
-def heightmap_rain_erosion(hm, nbDrops, erosionCoef, sedimentationCoef, rnd=0):
-    _lib.TCOD_heightmap_rain_erosion(hm.p, nbDrops, c_float( erosionCoef),
-                                     c_float( sedimentationCoef), rnd)
-
-def heightmap_kernel_transform(hm, kernelsize, dx, dy, weight, minLevel,
-                               maxLevel):
-    FARRAY = c_float * kernelsize
-    IARRAY = c_int * kernelsize
-    cdx = IARRAY(*dx)
-    cdy = IARRAY(*dy)
-    cweight = FARRAY(*weight)
-    _lib.TCOD_heightmap_kernel_transform(hm.p, kernelsize, cdx, cdy, cweight,
-                                         c_float(minLevel), c_float(maxLevel))
-
-def heightmap_add_voronoi(hm, nbPoints, nbCoef, coef, rnd=0):
-    FARRAY = c_float * nbCoef
-    ccoef = FARRAY(*coef)
-    _lib.TCOD_heightmap_add_voronoi(hm.p, nbPoints, nbCoef, ccoef, rnd)
-
-def heightmap_add_fbm(hm, noise, mulx, muly, addx, addy, octaves, delta, scale):
-    _lib.TCOD_heightmap_add_fbm(hm.p, noise, c_float(mulx), c_float(muly),
-                                c_float(addx), c_float(addy),
-                                c_float(octaves), c_float(delta),
-                                c_float(scale))
-def heightmap_scale_fbm(hm, noise, mulx, muly, addx, addy, octaves, delta,
-                        scale):
-    _lib.TCOD_heightmap_scale_fbm(hm.p, noise, c_float(mulx), c_float(muly),
-                                  c_float(addx), c_float(addy),
-                                  c_float(octaves), c_float(delta),
-                                  c_float(scale))
-def heightmap_dig_bezier(hm, px, py, startRadius, startDepth, endRadius,
-                         endDepth):
-    IARRAY = c_int * 4
-    cpx = IARRAY(*px)
-    cpy = IARRAY(*py)
-    _lib.TCOD_heightmap_dig_bezier(hm.p, cpx, cpy, c_float(startRadius),
-                                   c_float(startDepth), c_float(endRadius),
-                                   c_float(endDepth))
-
-def heightmap_get_value(hm, x, y):
-    return _lib.TCOD_heightmap_get_value(hm.p, x, y)
-
-def heightmap_get_interpolated_value(hm, x, y):
-    return _lib.TCOD_heightmap_get_interpolated_value(hm.p, c_float(x),
-                                                     c_float(y))
-
-def heightmap_get_slope(hm, x, y):
-    return _lib.TCOD_heightmap_get_slope(hm.p, x, y)
-
-def heightmap_get_normal(hm, x, y, waterLevel):
-    FARRAY = c_float * 3
-    cn = FARRAY()
-    _lib.TCOD_heightmap_get_normal(hm.p, c_float(x), c_float(y), cn,
-                                   c_float(waterLevel))
-    return cn[0], cn[1], cn[2]
-
-def heightmap_count_cells(hm, mi, ma):
-    return _lib.TCOD_heightmap_count_cells(hm.p, c_float(mi), c_float(ma))
-
-def heightmap_has_land_on_border(hm, waterlevel):
-    return _lib.TCOD_heightmap_has_land_on_border(hm.p, c_float(waterlevel))
-
-def heightmap_get_minmax(hm):
-    mi = c_float()
-    ma = c_float()
-    _lib.TCOD_heightmap_get_minmax(hm.p, byref(mi), byref(ma))
-    return mi.value, ma.value
-
-def heightmap_delete(hm):
-    _lib.TCOD_heightmap_delete(hm.p)
-
 
 ############################
-# name generator module
+# lazily loaded modules
 ############################
-_lib.TCOD_namegen_generate.restype = c_char_p
-_lib.TCOD_namegen_generate_custom.restype = c_char_p
-
-def namegen_parse(filename,random=0) :
-    _lib.TCOD_namegen_parse(filename,random)
-
-def namegen_generate(name) :
-    return _lib.TCOD_namegen_generate(name, 0)
-
-def namegen_generate_custom(name, rule) :
-    return _lib.TCOD_namegen_generate(name, rule, 0)
-
-def namegen_get_sets():
-    nb=_lib.TCOD_namegen_get_nb_sets_wrapper()
-    SARRAY = c_char_p * nb;
-    setsa = SARRAY()
-    _lib.TCOD_namegen_get_sets_wrapper(setsa)
-    return list(setsa)
-
-def namegen_destroy() :
-    _lib.TCOD_namegen_destroy()
-
-
+# The parser, bsp, heightmap, noise and name generator modules live in
+# their own files and are only imported when one of their names is first
+# looked up on libtcodpy, so a game that does not use them does not pay
+# for their setup at startup. Names are matched by prefix.
+_LAZY_MODULES = (
+    ('libtcod_parser', ('parser_', 'struct_', 'Dice', 'TYPE_')),
+    ('libtcod_bsp', ('bsp_', 'Bsp', 'BSP_')),
+    ('libtcod_heightmap', ('heightmap_', 'HeightMap')),
+    ('libtcod_noise', ('noise_', 'NOISE_')),
+    ('libtcod_namegen', ('namegen_',)),
+)
+
+def _load_module(module, prefixes):
+    # import a lazy module and copy its names here, so later lookups are
+    # ordinary attribute accesses
+    m = __import__(module)
+    for name, value in vars(m).items():
+        if name.startswith(prefixes):
+            globals()[name] = value
+
+def __getattr__(name):
+    if name == '__all__':
+        # from libtcodpy import * asks for __all__: load every module and
+        # export the same names as when nothing was lazy
+        for module, prefixes in _LAZY_MODULES:
+            _load_module(module, prefixes)
+        names = [n for n in globals() if not n.startswith('_')]
+        globals()['__all__'] = names
+        return names
+    for module, prefixes in _LAZY_MODULES:
+        if name.startswith(prefixes):
+            _load_module(module, prefixes)
+            if name in globals():
+                return globals()[name]
+            break
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    names = list(globals())
+    for module, prefixes in _LAZY_MODULES:
+        names.extend(name for name in vars(__import__(module)) if name.startswith(prefixes))
+    return sorted(set(names))
+
+# module __getattr__ needs Python 3.7, older versions load everything now
+if sys.version_info < (3, 7):
+    for _module, _prefixes in _LAZY_MODULES:
+        _load_module(_module, _prefixes)
+    del _module, _prefixes
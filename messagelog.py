@@ -0,0 +1,97 @@
+# Message log for Escape.
+#
+# The panel shows the last few wrapped lines, and older messages are kept in
+# a scrollback of fixed capacity that the history viewer pages through.
+# Both are ring buffers, so adding a message costs the same however long the
+# game has run and memory stays bounded. Wrapping is cached per (text,
+# width): combat keeps repeating the same few messages.
+
+import textwrap
+from array import array
+from collections import deque
+
+import libtcodpy as libtcod
+
+class MessageLog(object):
+    def __init__(self, width, height, history=1000, wrap_cache_size=512):
+        # width is the wrap width of the panel and height the number of
+        # lines it shows; history is how many messages the scrollback keeps
+        self.width = width
+        # The last height lines as (line, color), oldest first
+        self.lines = deque(maxlen=height)
+
+        # Scrollback ring: the message n is in slot n % capacity. Identical
+        # texts share one string and colors are packed as 0xRRGGBB.
+        self.capacity = history
+        self.texts = [None] * history
+        self.colors = array('I', [0]) * history
+        # Number of messages ever added
+        self.count = 0
+        self.interned = {}
+
+        self.wrap_cache = {}
+        self.wrap_cache_size = wrap_cache_size
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def wrap(self, text, width):
+        # Split text in lines of at most width characters
+        key = (text, width)
+        lines = self.wrap_cache.get(key)
+        if lines is None:
+            if len(self.wrap_cache) >= self.wrap_cache_size:
+                self.wrap_cache.clear()
+            lines = tuple(textwrap.wrap(text, width))
+            self.wrap_cache[key] = lines
+        return lines
+
+    def intern(self, text):
+        # Share one string between identical messages. Texts that left the
+        # scrollback are dropped once the table holds twice as many texts as
+        # the scrollback can: a rebuild keeps at most capacity of them, so
+        # it happens at most once every capacity new texts.
+        shared = self.interned.get(text)
+        if shared is None:
+            if len(self.interned) >= 2 * self.capacity:
+                self.interned = dict((t, t) for t in self.texts if t is not None)
+            self.interned[text] = shared = text
+        return shared
+
+    def add(self, text, color):
+        for line in self.wrap(text, self.width):
+            # A full deque drops its oldest line by itself
+            self.lines.append((line, color))
+
+        i = self.count % self.capacity
+        self.texts[i] = self.intern(text)
+        self.colors[i] = (color.r << 16) | (color.g << 8) | color.b
+        self.count += 1
+
+    def history_size(self):
+        # Number of messages in the scrollback
+        return min(self.count, self.capacity)
+
+    def message(self, age):
+        # (text, color) of a message in the scrollback, 0 being the newest
+        i = (self.count - 1 - age) % self.capacity
+        c = self.colors[i]
+        return self.texts[i], libtcod.Color(c >> 16, (c >> 8) & 0xff, c & 0xff)
+
+    def history_lines(self, skip, count, width):
+        # Up to count wrapped lines of the scrollback, oldest first, ending
+        # skip lines before the newest one. Only the messages on that page
+        # are wrapped.
+        page = []
+        age = 0
+        while len(page) < skip + count and age < self.history_size():
+            (text, color) = self.message(age)
+            for line in reversed(self.wrap(text, width)):
+                page.append((line, color))
+            age += 1
+        page = page[skip:skip + count]
+        page.reverse()
+        return page
@@ -0,0 +1,96 @@
+# Turn scheduler for Escape.
+#
+# Actors wait in a priority queue ordered by the game time of their next
+# action; acting makes them wait again for a delay that depends on their
+# speed, so a speed 200 actor acts twice as often as a speed 100 one.
+# Actors that have nothing to do (monsters out of sight) are put to sleep:
+# they leave the queue and are filed in a coarse grid by position, so a
+# turn only costs something for the actors awake, and waking the ones
+# around a spot only looks at a few grid buckets.
+
+import heapq
+
+# Speed of an ordinary actor, and the time one action of it takes
+NORMAL_SPEED = 100
+ACTION_COST = 100
+
+class Scheduler(object):
+    def __init__(self, bucket_size=16):
+        # Current game time
+        self.time = 0
+        # Heap of (time, order, actor); order keeps ties first come first served
+        self.queue = []
+        self.order = 0
+        # Actor -> order of its live queue entry. Entries of actors that were
+        # removed or put to sleep stay in the heap and are skipped.
+        self.awake = {}
+        # (bx, by) -> sleeping actors filed at that spot
+        self.bucket_size = bucket_size
+        self.sleeping = {}
+        self.sleeping_at = {}
+
+    def delay(self, speed):
+        # Time between two actions of an actor of that speed, never 0 so
+        # the fastest actors still let time pass
+        return max(1, ACTION_COST * NORMAL_SPEED // speed)
+
+    def schedule(self, actor, delay=0):
+        # Queue actor to act delay from now
+        self.schedule_at(actor, self.time + delay)
+
+    def schedule_at(self, actor, when):
+        # Queue actor to act at the game time when
+        self.order += 1
+        self.awake[actor] = self.order
+        heapq.heappush(self.queue, (when, self.order, actor))
+
+    def advance(self, time):
+        # Move the clock forward by time and yield (when, actor) for every
+        # actor due in the window [old time, new time), in order, when being
+        # the time it was due. Each one must be scheduled again (or put to
+        # sleep) to act another time; scheduling it at when + its delay
+        # keeps its pace, and if that is still within the window it comes
+        # out again before advance ends. The window is half-open, so an
+        # actor queued now acts once per window at normal speed.
+        self.time += time
+        queue = self.queue
+        while queue and queue[0][0] < self.time:
+            (when, order, actor) = heapq.heappop(queue)
+            if self.awake.get(actor) == order:
+                del self.awake[actor]
+                yield (when, actor)
+
+    def bucket(self, x, y):
+        return (x // self.bucket_size, y // self.bucket_size)
+
+    def sleep(self, actor):
+        # Take actor off the queue until wake_near is called near it. It is
+        # filed where it stands and must not move while asleep.
+        self.awake.pop(actor, None)
+        key = self.bucket(actor.x, actor.y)
+        self.sleeping.setdefault(key, []).append(actor)
+        self.sleeping_at[actor] = key
+
+    def remove(self, actor):
+        # Forget actor, awake or asleep
+        self.awake.pop(actor, None)
+        key = self.sleeping_at.pop(actor, None)
+        if key is not None:
+            bucket = self.sleeping[key]
+            bucket.remove(actor)
+            if not bucket:
+                del self.sleeping[key]
+
+    def wake_near(self, x, y, radius, wake):
+        # Schedule right away the sleeping actors within radius of (x, y)
+        # for which wake(actor) is true
+        (bx1, by1) = self.bucket(x - radius, y - radius)
+        (bx2, by2) = self.bucket(x + radius, y + radius)
+        for by in range(by1, by2 + 1):
+            for bx in range(bx1, bx2 + 1):
+                bucket = self.sleeping.get((bx, by))
+                if bucket is None:
+                    continue
+                for actor in [a for a in bucket if wake(a)]:
+                    self.remove(actor)
+                    self.schedule(actor)
@@ -0,0 +1,264 @@
+# Compact tile storage for Escape maps.
+#
+# Instead of one Tile object per cell, the map keeps three flat byte planes
+# (blocked, block_sight, explored), one byte per cell, stored row by row.
+# Rooms and tunnels are carved with slice assignments, so a whole row or
+# column is updated in a single operation.
+
+try:  #import NumPy if available
+    import numpy
+    numpy_available = True
+except ImportError:
+    numpy_available = False
+
+# Translation table turning 0 into 1 and everything else into 0
+_INVERT = bytes(bytearray([1] + [0] * 255))
+
+class TileMap(object):
+    def __init__(self, width, height, blocked=True):
+        # Create a width x height map where every tile is either blocked
+        # (walls, the default) or open floor.
+        self.width = width
+        self.height = height
+        n = width * height
+        fill = b'\x01' if blocked else b'\x00'
+        self.blocked = bytearray(fill * n)
+        self.block_sight = bytearray(fill * n)
+        self.explored = bytearray(n)
+        # Indexes of the cells whose blocked/block_sight changed since the
+        # last call to pop_dirty, so the FOV map can be updated cell by cell.
+        # None until the first pop_dirty: a new map is dirty everywhere, and
+        # generation does not pay for tracking every carved cell.
+        self.dirty = None
+
+    def view(self, plane):
+        # A (height, width) NumPy view sharing memory with one of the planes,
+        # so vectorized writes go straight into the map
+        return numpy.frombuffer(plane, dtype=numpy.uint8).reshape(self.height, self.width)
+
+    def set_tiles(self, blocked, block_sight=None):
+        # set_tile for the whole map at once: blocked and block_sight hold
+        # one value per cell, as (height, width) arrays, lists of rows or
+        # flat sequences, and anything non-zero blocks. With NumPy this is
+        # one vectorized operation, e.g. a heightmap compared with a water
+        # level.
+        if block_sight is None:
+            block_sight = blocked
+        if numpy_available:
+            shape = (self.height, self.width)
+            blocked = (numpy.asarray(blocked) != 0).reshape(shape)
+            block_sight = (numpy.asarray(block_sight) != 0).reshape(shape)
+            blocked_view = self.view(self.blocked)
+            block_sight_view = self.view(self.block_sight)
+            if self.dirty is not None:
+                changed = (blocked_view != blocked) | (block_sight_view != block_sight)
+                self.dirty.update(numpy.flatnonzero(changed).tolist())
+            blocked_view[...] = blocked
+            block_sight_view[...] = block_sight
+            return
+
+        blocked = self._plane(blocked)
+        block_sight = self._plane(block_sight)
+        if self.dirty is not None:
+            self.dirty.update(i for i in range(len(blocked))
+                              if blocked[i] != self.blocked[i] or block_sight[i] != self.block_sight[i])
+        self.blocked[:] = blocked
+        self.block_sight[:] = block_sight
+
+    def _plane(self, values):
+        # A 0/1 plane from one value per cell, flat or as rows
+        values = list(values)
+        if values and hasattr(values[0], '__len__'):
+            values = [v for row in values for v in row]
+        if len(values) != self.width * self.height:
+            raise ValueError('Expected %d values, got %d' % (self.width * self.height, len(values)))
+        return bytearray(1 if v != 0 else 0 for v in values)
+
+    def transparent(self):
+        # Plane of see-through cells, the inverse of block_sight
+        return bytes(self.block_sight.translate(_INVERT))
+
+    def walkable(self):
+        # Plane of passable cells, the inverse of blocked
+        return bytes(self.blocked.translate(_INVERT))
+
+    def pop_dirty(self):
+        # Return the changed cell indexes (None meaning the whole map) and
+        # start tracking afresh
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    def index(self, x, y):
+        # Position of the cell (x, y) in the flat planes
+        return y * self.width + x
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_blocked(self, x, y):
+        return self.blocked[y * self.width + x] != 0
+
+    def is_block_sight(self, x, y):
+        return self.block_sight[y * self.width + x] != 0
+
+    def is_explored(self, x, y):
+        return self.explored[y * self.width + x] != 0
+
+    def set_explored(self, x, y, explored=True):
+        self.explored[y * self.width + x] = 1 if explored else 0
+
+    def set_tile(self, x, y, blocked, block_sight=None):
+        # By default, if the tile is blocked, it also blocks sight
+        if block_sight is None:
+            block_sight = blocked
+        i = y * self.width + x
+        self.blocked[i] = 1 if blocked else 0
+        self.block_sight[i] = 1 if block_sight else 0
+        if self.dirty is not None:
+            self.dirty.add(i)
+
+    def carve_rect(self, x1, y1, x2, y2):
+        # Make every tile in the rectangle (bounds inclusive) passable, one
+        # row slice at a time
+        if x2 < x1 or y2 < y1:
+            return
+        run = bytearray(x2 - x1 + 1)
+        for y in range(y1, y2 + 1):
+            start = y * self.width + x1
+            self.blocked[start:start + len(run)] = run
+            self.block_sight[start:start + len(run)] = run
+            if self.dirty is not None:
+                self.dirty.update(range(start, start + len(run)))
+
+    def carve_h_line(self, x1, x2, y):
+        # Horizontal tunnel, a single contiguous slice
+        x1, x2 = min(x1, x2), max(x1, x2)
+        start = y * self.width + x1
+        run = bytearray(x2 - x1 + 1)
+        self.blocked[start:start + len(run)] = run
+        self.block_sight[start:start + len(run)] = run
+        if self.dirty is not None:
+            self.dirty.update(range(start, start + len(run)))
+
+    def carve_v_line(self, y1, y2, x):
+        # Vertical tunnel, an extended slice stepping one row at a time
+        y1, y2 = min(y1, y2), max(y1, y2)
+        start = y1 * self.width + x
+        stop = y2 * self.width + x + 1
+        run = bytearray(y2 - y1 + 1)
+        self.blocked[start:stop:self.width] = run
+        self.block_sight[start:stop:self.width] = run
+        if self.dirty is not None:
+            self.dirty.update(range(start, stop, self.width))
+
+class ChunkedTileMap(object):
+    # A world map split into fixed-size TileMap chunks. Chunks are created
+    # on first use by calling generate(cx, cy, width, height), which must
+    # return the TileMap for that chunk, so only the parts of the world
+    # someone went near take any memory.
+    def __init__(self, width, height, chunk_width, chunk_height, generate):
+        self.width = width
+        self.height = height
+        self.chunk_width = chunk_width
+        self.chunk_height = chunk_height
+        self.generate = generate
+        self.chunks = {}
+        # World (x, y) of the cells changed with set_tile since the last
+        # call to pop_dirty
+        self.dirty = set()
+
+    def chunk_size(self, cx, cy):
+        # Chunks on the right and bottom edges may be cut short
+        return (min(self.chunk_width, self.width - cx * self.chunk_width),
+                min(self.chunk_height, self.height - cy * self.chunk_height))
+
+    def chunk(self, cx, cy):
+        # The chunk (cx, cy), generating it if needed
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            (w, h) = self.chunk_size(cx, cy)
+            chunk = self.generate(cx, cy, w, h)
+            self.chunks[(cx, cy)] = chunk
+        return chunk
+
+    def ensure_region(self, x, y, w, h):
+        # Generate every chunk overlapping the rectangle
+        x1 = max(x, 0) // self.chunk_width
+        x2 = min(x + w - 1, self.width - 1) // self.chunk_width
+        y1 = max(y, 0) // self.chunk_height
+        y2 = min(y + h - 1, self.height - 1) // self.chunk_height
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                self.chunk(cx, cy)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def _locate(self, x, y):
+        (cx, lx) = divmod(x, self.chunk_width)
+        (cy, ly) = divmod(y, self.chunk_height)
+        chunk = self.chunk(cx, cy)
+        return chunk, ly * chunk.width + lx
+
+    def is_blocked(self, x, y):
+        # Everything outside the world is solid rock
+        if not self.in_bounds(x, y):
+            return True
+        (chunk, i) = self._locate(x, y)
+        return chunk.blocked[i] != 0
+
+    def is_block_sight(self, x, y):
+        if not self.in_bounds(x, y):
+            return True
+        (chunk, i) = self._locate(x, y)
+        return chunk.block_sight[i] != 0
+
+    def is_explored(self, x, y):
+        if not self.in_bounds(x, y):
+            return False
+        (chunk, i) = self._locate(x, y)
+        return chunk.explored[i] != 0
+
+    def set_tile(self, x, y, blocked, block_sight=None):
+        # The rock outside the world cannot be changed: ignore it rather
+        # than generating a chunk that is not part of the world
+        if not self.in_bounds(x, y):
+            return
+        (chunk, i) = self._locate(x, y)
+        (y0, x0) = divmod(i, chunk.width)
+        chunk.set_tile(x0, y0, blocked, block_sight)
+        self.dirty.add((x, y))
+
+    def pop_dirty(self):
+        dirty = self.dirty
+        self.dirty = set()
+        return dirty
+
+    def _spans(self, x, y, w, h):
+        # For every row of the rectangle, the runs of cells falling in each
+        # chunk: (chunk, chunk offset, window offset, length)
+        for row in range(h):
+            (cy, ly) = divmod(y + row, self.chunk_height)
+            wx = x
+            while wx < x + w:
+                (cx, lx) = divmod(wx, self.chunk_width)
+                chunk = self.chunk(cx, cy)
+                n = min(chunk.width - lx, x + w - wx)
+                yield chunk, ly * chunk.width + lx, row * w + wx - x, n
+                wx += n
+
+    def read_window(self, x, y, w, h):
+        # Copy of the w x h rectangle at (x, y) as a TileMap, one slice per
+        # row and chunk. The rectangle must lie inside the world.
+        window = TileMap(w, h)
+        for (chunk, src, dst, n) in self._spans(x, y, w, h):
+            window.blocked[dst:dst + n] = chunk.blocked[src:src + n]
+            window.block_sight[dst:dst + n] = chunk.block_sight[src:src + n]
+            window.explored[dst:dst + n] = chunk.explored[src:src + n]
+        return window
+
+    def write_explored(self, window, x, y):
+        # Store the explored flags of a window made by read_window back
+        for (chunk, src, dst, n) in self._spans(x, y, window.width, window.height):
+            chunk.explored[src:src + n] = window.explored[dst:dst + n]